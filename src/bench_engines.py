@@ -0,0 +1,124 @@
+"""Benchmark and cross-check the recon engines on synthetic bookings.
+
+Generates NBIM/custody CSVs with N legs (a fixed share of them broken),
+runs every requested engine through load -> align -> classify -> prioritize
+and prints wall time per engine. With --check the break outputs of each
+engine are compared against the pandas reference and the run fails on any
+difference.
+
+    python bench_engines.py --rows 1000000 10000000 --check
+
+The Polars timing includes break labelling, which runs the shared Python
+label builder per batch under the GIL. That step is single-threaded in
+both engines and caps the Polars speed-up (about 1.8x at 1M legs).
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from recon_loader import JOIN_KEYS
+from recon_breaks import BREAK_FIELDS
+from recon_engine import get_engine
+
+BREAK_OUTPUT_COLUMNS = JOIN_KEYS + list(BREAK_FIELDS) + ['break_label', 'cash_impact', 'priority']
+
+CURRENCIES = np.array(['USD', 'KRW', 'CHF', 'GBP', 'SEK', 'JPY', 'EUR'])
+TAX_RATES = np.array([15, 20, 22, 25, 35])
+
+
+def write_synthetic_bookings(n: int, out_dir: Path, seed: int = 42, break_share: float = 0.05):
+    """Write NBIM and custody CSVs with `n` matching legs; return their paths."""
+    rng = np.random.default_rng(seed)
+    legs = np.arange(n)
+    event_key = 900000000 + legs // 4
+    isin = np.char.add('US', np.char.zfill((legs // 4).astype(str), 10))
+    bank_account = 500000000 + legs
+    ccy = CURRENCIES[rng.integers(0, len(CURRENCIES), n)]
+    tax = TAX_RATES[rng.integers(0, len(TAX_RATES), n)]
+    gross = rng.integers(1_000, 10_000_000, n)
+    net = np.round(gross * (1 - tax / 100), 2)
+    fx = np.round(rng.uniform(0.005, 15.0, n), 4)
+
+    nbim = pd.DataFrame({
+        'COAC_EVENT_KEY': event_key,
+        'ISIN': isin,
+        'ORGANISATION_NAME': 'Synthetic Co',
+        'BANK_ACCOUNT': bank_account,
+        'GROSS_AMOUNT_QUOTATION': gross,
+        'NET_AMOUNT_QUOTATION': net,
+        'WTHTAX_RATE': tax,
+        'AVG_FX_RATE_QUOTATION_TO_PORTFOLIO': fx,
+        'QUOTATION_CURRENCY': ccy,
+        'SETTLEMENT_CURRENCY': ccy,
+    })
+
+    # Custody mirrors NBIM, then a share of legs gets one of the known break shapes
+    cust_tax = tax.copy()
+    cust_net = net.copy()
+    cust_fx = fx.copy()
+    broken = rng.random(n) < break_share
+    kind = rng.integers(0, 3, n)
+    cust_fx[broken & (kind == 0)] = 1.0
+    cust_tax[broken & (kind == 1)] = np.maximum(cust_tax[broken & (kind == 1)] - 2, 0)
+    cust_net[broken & (kind == 2)] = np.round(cust_net[broken & (kind == 2)] * 1.07, 2)
+
+    custody = pd.DataFrame({
+        'COAC_EVENT_KEY': event_key,
+        'ISIN': isin,
+        'BANK_ACCOUNTS': bank_account,
+        'GROSS_AMOUNT': gross,
+        'NET_AMOUNT_QC': cust_net,
+        'TAX_RATE': cust_tax,
+        'FX_RATE': cust_fx,
+    })
+
+    nbim_path = out_dir / f"NBIM_synthetic_{n}.csv"
+    custody_path = out_dir / f"CUSTODY_synthetic_{n}.csv"
+    nbim.to_csv(nbim_path, sep=';', index=False)
+    custody.to_csv(custody_path, sep=';', index=False)
+    return nbim_path, custody_path
+
+
+def break_outputs(df: pd.DataFrame) -> pd.DataFrame:
+    """Key + break columns in a stable row order for comparison."""
+    return df[BREAK_OUTPUT_COLUMNS].sort_values(JOIN_KEYS).reset_index(drop=True)
+
+
+def run_benchmark(rows, engines, check: bool = False, seed: int = 42):
+    for n in rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            nbim_path, custody_path = write_synthetic_bookings(n, Path(tmp), seed=seed)
+            results = {}
+            for name in engines:
+                engine = get_engine(name)
+                start = time.perf_counter()
+                results[name] = engine.analyze(str(nbim_path), str(custody_path))
+                elapsed = time.perf_counter() - start
+                n_breaks = int((results[name]['break_label'] != 'ok').sum())
+                print(f"{n:>12,} legs  {name:<8} {elapsed:9.2f}s  {n / elapsed:12,.0f} legs/s  {n_breaks:,} breaks")
+
+            if check and 'pandas' in results:
+                reference = break_outputs(results['pandas'])
+                for name, result in results.items():
+                    if name == 'pandas':
+                        continue
+                    pd.testing.assert_frame_equal(
+                        reference, break_outputs(result), check_dtype=False
+                    )
+                    print(f"{n:>12,} legs  {name:<8} break outputs identical to pandas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--engines", nargs="+", default=["pandas", "polars"])
+    parser.add_argument("--check", action="store_true",
+                        help="fail if any engine's break outputs differ from pandas")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.engines, check=args.check, seed=args.seed)
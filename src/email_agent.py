@@ -4,24 +4,50 @@ from __future__ import annotations
 import pandas as pd
 from typing import List, Dict, Any
 from llm_client import call_llm
+from llm_prompts import RUN_BUDGET, estimate_tokens, fit_items, truncate_text
+
+# Fixed instructions; recipient, sender, summary and facts go in the user
+# message so this prefix is identical on every call.
+EMAIL_SYSTEM_PROMPT = """Senior reconciliation analyst. From the summary and per-break facts, write a send-ready email with ONLY what matters. Markdown, no extra commentary:
+
+Subject: Reconciliation — Top FX Corrections (24h)
+To: [To]
+Cc:
+---
+Executive summary, max 2 sentences.
+**Immediate Corrections** (max 3): [Security] — [Event]: Fix [side] → [rate]. Impact: $[amount].
+**Systemic Fixes** (max 2, optional): pattern, owner, action.
+**Cash Impact**: total exposure; largest driver and amount.
+**Next Cycle**: 2 preventive steps.
+Best,
+[Sender]
+
+Pick by cash_impact, then priority, then is_inversion. Prefer FX breaks. Exact rates from the data; invent nothing. Body under 120 words."""
+
+# Share of the email prompt budget the business summary may use, so a long
+# summary cannot crowd out the highest-priority break facts
+SUMMARY_SHARE = 0.5
 
 
 def _rows_to_summary_items(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # absent values stay None so compact_json drops them from the prompt
     items: List[Dict[str, Any]] = []
     for _, row in df.iterrows():
         items.append({
-            "event": row.get("event_key", "Unknown"),
-            "security": row.get("organisation", row.get("instrument_description", "Unknown")),
-            "break_type": row.get("break_label", "Unknown"),
-            "priority": row.get("priority", "MEDIUM"),
-            "cash_impact": row.get("cash_impact", 0),
-            "bank_account": row.get("bank_account", "Unknown"),
-            "correct_side": row.get("correct_side", "unknown"),
+            "event": row.get("event_key"),
+            "security": row.get("organisation", row.get("instrument_description")),
+            "break_type": row.get("break_label"),
+            "priority": row.get("priority"),
+            "cash_impact": row.get("cash_impact"),
+            "bank_account": row.get("bank_account"),
+            "recalc_side": row.get("recalc_side"),
+            "recalc_label": row.get("recalc_label"),
+            "correct_side": row.get("correct_side"),
             "market_fx": row.get("market_fx"),
             "suggested_rate": row.get("suggested_rate"),
-            "is_inversion": row.get("is_inversion", False),
-            "nbim_fx": row.get("nbim_fx"),
-            "custody_fx": row.get("custody_fx"),
+            "is_inversion": row.get("is_inversion"),
+            "nbim_fx": row.get("fx_nbim"),
+            "custody_fx": row.get("fx_cust"),
         })
     return items
 
@@ -39,47 +65,17 @@ def generate_recon_email_concise(
     """
     items = _rows_to_summary_items(df_with_fx)
 
-    prompt = f"""
-You are a senior reconciliation analyst. You will receive a full summary and structured
-per-break facts. Write an extremely concise, send-ready email that surfaces ONLY what matters.
-
-**STRICT FORMAT (Markdown only, no extra commentary):**
-Subject: Reconciliation — Top FX Corrections (24h)
-To: {audience}
-Cc:
----
-Executive (≤2 sentences).
-
-**Immediate Corrections (max 3)**
-- [Security] — [Event]: Fix [side] → [rate]. Impact: $[amount].
-
-**Systemic Fixes (max 2, optional)**
-- [pattern/owner/action]
-
-**Cash Impact**
-- Total exposure: $[sum]
-- Largest driver: [Security/Event] $[amount]
-
-**Next Cycle**
-- [Preventive step 1]
-- [Preventive step 2]
-
-Best,
-{sender_name}
-
-**DECISION RULES (very important):**
-- Choose items by: highest cash_impact, then priority (HIGH>MEDIUM>LOW), then is_inversion=True.
-- Prefer FX-related breaks; ignore non-FX noise unless they dominate exposure.
-- Use exact rates from the data; do NOT invent numbers.
-- Keep the total email body under ~120 words. No filler.
-
-=== FULL BUSINESS SUMMARY (Markdown) ===
-{business_summary_md}
-
-=== STRUCTURED FACTS (JSON-like) ===
-{items}
-"""
-    return call_llm(prompt)
+    head = f"To:{audience}\nSender:{sender_name}\n=== FULL BUSINESS SUMMARY (Markdown) ===\n"
+    facts_title = "=== STRUCTURED FACTS (JSON, highest priority first) ===\n"
+    budget = RUN_BUDGET.available(EMAIL_SYSTEM_PROMPT, head, facts_title)
+    # The summary gets at most SUMMARY_SHARE of the budget; facts get the rest
+    summary = truncate_text(business_summary_md, int(budget * SUMMARY_SHARE))
+    facts, dropped = fit_items(items, budget - estimate_tokens(summary))
+    header = f"{head}{summary}\n{facts_title}"
+    if dropped:
+        header += f"({dropped} lowest-priority breaks omitted)\n"
+
+    return call_llm(f"{header}{facts}", system=EMAIL_SYSTEM_PROMPT, label="email")
 
 
 def save_email_draft(email_md: str, out_path: str) -> None:
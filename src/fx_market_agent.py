@@ -1,13 +1,29 @@
+import numpy as np
 import pandas as pd
 from llm_client import call_llm
+from llm_prompts import compact_json
 import json
+import os
 import requests
 from time import sleep
 from typing import Optional
 
+# Override to point at a local stand-in (see mock_servers.py)
+NORGES_BANK_BASE_URL = os.getenv("NORGES_BANK_BASE_URL", "https://data.norges-bank.no/api")
+
 # Global cache to avoid redundant API calls
 FX_CACHE = {}
 
+# Fixed instructions for analyze_fx_discrepancy; per-break facts go in the
+# user message as compact JSON.
+FX_SYSTEM_PROMPT = (
+    "NBIM FX analyst. The facts JSON holds a deterministic decision (correct_side, "
+    "adjust_side, reason) from the Norges Bank market rate; explain it, do not change it. "
+    'Return only JSON: {"root_cause_hypothesis": str (1 sentence: stale rate, manual entry, '
+    'system bug...), "is_systematic": bool (one-off or recurring), '
+    '"process_improvement": str (specific action), "confidence": 0.0-1.0}'
+)
+
 def fetch_market_fx(base: str, quote: str, date: str) -> Optional[float]:
     """Fetch daily spot FX rate from Norges Bank with caching"""
     
@@ -21,7 +37,7 @@ def fetch_market_fx(base: str, quote: str, date: str) -> Optional[float]:
     
     # Otherwise fetch from API
     url = (
-        f"https://data.norges-bank.no/api/data/EXR/B.{base}.{quote}.SP"
+        f"{NORGES_BANK_BASE_URL}/data/EXR/B.{base}.{quote}.SP"
         f"?startPeriod={date}&endPeriod={date}&format=sdmx-json"
     )
     try:
@@ -105,32 +121,20 @@ def analyze_fx_discrepancy(nbim_fx: float, cust_fx: float, market_fx: float,
         error_description = f"NBIM using 1.0 (no FX conversion) for {base_ccy}→{quote_ccy}"
     
     # NOW use LLM only for rich explanation and systematic pattern detection
-    prompt = f"""
-    As NBIM FX Analyst, explain this FX discrepancy for executive summary:
-
-    DETERMINISTIC ANALYSIS (ALREADY DECIDED):
-    - Security: {security} ({base_ccy}/{quote_ccy})
-    - Market Rate (Norges Bank): {market_fx}
-    - NBIM Used: {nbim_fx} (error: {nbim_error_pct:.1f}%)
-    - Custody Used: {cust_fx} (error: {cust_error_pct:.1f}%)
-    - **Decision: {correct_side.upper()} is CORRECT, {wrong_side.upper()} must adjust**
-    - Reason: {error_description}
-
-    YOUR TASK (explanation only - do NOT change the decision):
-    1. Explain WHY this error likely occurred (stale rate? manual entry? system bug?)
-    2. Is this a one-off error or systematic issue?
-    3. Suggest process improvement to prevent recurrence
-
-    Return JSON:
-    {{
-        "root_cause_hypothesis": "string (1 sentence)",
-        "is_systematic": true/false,
-        "process_improvement": "string (specific action)",
-        "confidence": 0.0-1.0
-    }}
-    """
+    facts = {
+        "security": security,
+        "pair": f"{base_ccy}/{quote_ccy}",
+        "market_fx": market_fx,
+        "nbim_fx": nbim_fx,
+        "nbim_error_pct": round(nbim_error_pct, 2),
+        "cust_fx": cust_fx,
+        "cust_error_pct": round(cust_error_pct, 2),
+        "correct_side": correct_side,
+        "adjust_side": wrong_side,
+        "reason": error_description,
+    }
     
-    response = call_llm(prompt)
+    response = call_llm(compact_json(facts), system=FX_SYSTEM_PROMPT, label="fx_analysis")
     try:
         llm_insight = json.loads(response)
     except:
@@ -157,59 +161,91 @@ def analyze_fx_discrepancy(nbim_fx: float, cust_fx: float, market_fx: float,
         "confidence": llm_insight.get("confidence", 0.7)
     }
 
+# Columns added by verify_fx_with_intelligence, preallocated with a fixed
+# dtype so rows are written in place instead of collected as dicts.
+FX_ANALYSIS_COLUMNS = {
+    "correct_side": object,
+    "mandated_rate": np.float64,
+    "required_correction": object,
+    "error_description": object,
+    "nbim_error_pct": np.float64,
+    "cust_error_pct": np.float64,
+    "is_inversion": object,
+    "root_cause_hypothesis": object,
+    "is_systematic": object,
+    "process_improvement": object,
+    "confidence": np.float64,
+    "market_fx": np.float64,
+    "suggested_rate": np.float64,
+    "reason": object,
+}
+
 def verify_fx_with_intelligence(df: pd.DataFrame) -> pd.DataFrame:
-    """Apply LLM intelligence to FX breaks with actual market data"""
+    """Apply LLM intelligence to FX breaks with actual market data
+
+    Enriches `df` in place: the FX_ANALYSIS_COLUMNS are preallocated and
+    filled only on rows flagged break_fx; other rows keep NaN/None.
+    """
     
-    result = df.copy()
-    fx_analysis = []
+    n = len(df)
+    columns = {
+        name: np.full(n, np.nan) if dtype is np.float64 else np.full(n, None, dtype=object)
+        for name, dtype in FX_ANALYSIS_COLUMNS.items()
+    }
     
-    for _, row in df.iterrows():
-        if row.get('break_fx'):
-            # Get base currency from ISIN
-            isin = row.get('isin')
-            base_ccy = get_base_currency_from_isin(isin)
-            quote_ccy = "NOK"  # NBIM's base currency
-            
-            # Get security name for context
-            security = row.get('organisation') or row.get('instrument_description') or 'Unknown Security'
-            
-            # Try to get date for FX lookup
-            fx_date = row.get('exdate') or row.get('payment_date') or "2025-04-25"
-            
-            # Fetch actual market FX rate from Norges Bank
-            market_fx = fetch_market_fx(base_ccy, quote_ccy, fx_date)
+    fx_rows = np.flatnonzero(df['break_fx'].to_numpy(dtype=bool)) if 'break_fx' in df.columns else []
+    for pos in fx_rows:
+        row = df.iloc[pos]
+        # Get base currency from ISIN
+        isin = row.get('isin')
+        base_ccy = get_base_currency_from_isin(isin)
+        quote_ccy = "NOK"  # NBIM's base currency
+        
+        # Get security name for context
+        security = row.get('organisation') or row.get('instrument_description') or 'Unknown Security'
+        
+        # Try to get date for FX lookup
+        fx_date = row.get('exdate') or row.get('payment_date') or "2025-04-25"
+        
+        # Fetch actual market FX rate from Norges Bank
+        market_fx = fetch_market_fx(base_ccy, quote_ccy, fx_date)
+        
+        if market_fx:
+            print(f"Market FX for {base_ccy}/{quote_ccy} on {fx_date}: {market_fx}")
             
-            if market_fx:
-                print(f"Market FX for {base_ccy}/{quote_ccy} on {fx_date}: {market_fx}")
-                
-                # Analyze with LLM using actual market data - NOW INCLUDES SECURITY PARAMETER
-                analysis = analyze_fx_discrepancy(
-                    row.get('fx_nbim', 0), 
-                    row.get('fx_cust', 0), 
-                    market_fx,
-                    base_ccy, 
-                    quote_ccy,
-                    security  # ← ADD THIS LINE
-                )
-                analysis['market_fx'] = market_fx
-                fx_analysis.append(analysis)
-            else:
-                # No market data available
-                fx_analysis.append({
-                    "correct_side": "unknown", 
-                    "is_inversion": False, 
-                    "suggested_rate": None, 
-                    "confidence": 0.0,
-                    "reason": "No market FX data available",
-                    "market_fx": None
-                })
+            # Analyze with LLM using actual market data
+            analysis = analyze_fx_discrepancy(
+                row.get('fx_nbim', 0), 
+                row.get('fx_cust', 0), 
+                market_fx,
+                base_ccy, 
+                quote_ccy,
+                security
+            )
+            analysis['market_fx'] = market_fx
         else:
-            # Not an FX break
-            fx_analysis.append({})
+            # No market data available
+            analysis = {
+                "correct_side": "unknown", 
+                "is_inversion": False, 
+                "suggested_rate": None, 
+                "confidence": 0.0,
+                "reason": "No market FX data available",
+                "market_fx": None
+            }
+        
+        for name, value in analysis.items():
+            if value is None or name not in columns:
+                continue
+            if FX_ANALYSIS_COLUMNS[name] is np.float64:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue  # e.g. LLM returned "high" for confidence
+            columns[name][pos] = value
     
-    # Add analysis columns to DataFrame
-    if fx_analysis:
-        analysis_df = pd.DataFrame(fx_analysis)
-        result = pd.concat([result, analysis_df], axis=1)
+    # Add analysis columns to the frame without copying it
+    for name, values in columns.items():
+        df[name] = values
     
-    return result
\ No newline at end of file
+    return df
\ No newline at end of file
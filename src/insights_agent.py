@@ -1,63 +1,54 @@
 from llm_client import call_llm
+from llm_prompts import RUN_BUDGET, compact_json, fit_items
 import pandas as pd
 
+# Fixed instructions; the per-run facts follow in the user message.
+SUMMARY_SYSTEM_PROMPT = """Senior reconciliation analyst. Using the FX analysis in the breaks JSON, decide corrections. Markdown, these sections:
+
+## FX Correction Decisions
+**IMMEDIATE CORRECTION: [Security] - [Event]** - market vs NBIM vs custody FX; which side is correct; adjust the wrong side to [suggested rate]; deadline 24h.
+**SYSTEMIC FIX: [Security]** - issue, root cause (inversion, rate mapping...), action, owner team.
+
+## Cash Impact Resolution
+Total exposure $[total_cash_impact]; largest break; steps to recover funds.
+
+## Next Settlement Cycle Protection
+Two preventive measures.
+
+Decide, don't describe. Use exact rates from the data. Name an owner for every fix."""
+
 def generate_business_summary(df: pd.DataFrame) -> str:
     """LLM synthesizes analysis with ACTUAL FX corrections"""
     
-    # Prepare summary with FX analysis results
+    # Prepare summary with FX analysis results (null fields are dropped)
     summary_data = []
     for _, row in df.iterrows():
         item = {
-            'event': row.get('event_key', 'Unknown'),
-            'security': row.get('organisation', row.get('instrument_description', 'Unknown')),
-            'break_type': row.get('break_label', 'Unknown'),
-            'priority': row.get('priority', 'MEDIUM'),
-            'cash_impact': row.get('cash_impact', 0),
-            'bank_account': row.get('bank_account', 'Unknown'),
+            'event': row.get('event_key'),
+            'security': row.get('organisation', row.get('instrument_description')),
+            'break_type': row.get('break_label'),
+            'priority': row.get('priority'),
+            'cash_impact': row.get('cash_impact'),
+            'bank_account': row.get('bank_account'),
+            'recalc_side': row.get('recalc_side'),
+            'recalc_label': row.get('recalc_label'),
             # Include the actual FX analysis results
-            'correct_side': row.get('correct_side', 'unknown'),
+            'correct_side': row.get('correct_side'),
             'market_fx': row.get('market_fx'),
             'suggested_rate': row.get('suggested_rate'),
-            'is_inversion': row.get('is_inversion', False)
+            'is_inversion': row.get('is_inversion')
         }
         
         summary_data.append(item)
     
-    prompt = f"""
-    As a senior reconciliation analyst, provide decisive actions based on ACTUAL FX analysis:
-
-    {summary_data}
-
-    Structure your response EXACTLY like this:
-
-    ## FX Correction Decisions
-
-    **IMMEDIATE CORRECTION: [Security] - [Event]**
-    - **Market FX Evidence:** [market rate] vs [NBIM rate] vs [Custody rate]
-    - **Determination:** [NBIM/Custody] has correct FX based on market data
-    - **Action:** Adjust [incorrect side] to use [suggested rate]
-    - **Deadline:** Immediate (24 hours)
-
-    **SYSTEMIC FIX: [Security] - Pattern Detected**
-    - **Issue:** [Description of systematic error]
-    - **Root Cause:** [Inversion error / Rate mapping bug / etc.]
-    - **Action:** [Fix data pipeline / Update rate mapping / etc.]
-    - **Owner:** [Team responsible]
-
-    ## Cash Impact Resolution
-    - **Total Exposure:** $[sum of all cash impacts]
-    - **Primary Issue:** [Largest cash impact break]
-    - **Resolution Path:** [Specific steps to recover funds]
-
-    ## Next Settlement Cycle Protection
-    1. **[Preventive measure 1]**
-    2. **[Preventive measure 2]**
-
-    Rules:
-    - MAKE DECISIONS based on the FX analysis provided
-    - Specify EXACT RATES to use for corrections
-    - Assign ACTUAL OWNERS for each fix
-    - Focus on RECOVERING CASH, not just describing problems
-    """
-
-    return call_llm(prompt)
\ No newline at end of file
+    # Totals are exact even if low-priority items are cut to fit the budget
+    totals = {
+        'breaks': len(summary_data),
+        'total_cash_impact': float(df['cash_impact'].sum()) if 'cash_impact' in df.columns else None,
+    }
+    header = f"Totals:{compact_json(totals)}\nBreaks (highest priority first):"
+    facts, dropped = fit_items(summary_data, RUN_BUDGET.available(SUMMARY_SYSTEM_PROMPT, header))
+    if dropped:
+        header = header.replace("Breaks", f"Breaks ({dropped} lowest-priority omitted)")
+
+    return call_llm(f"{header}{facts}", system=SUMMARY_SYSTEM_PROMPT, label="summary")
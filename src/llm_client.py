@@ -1,8 +1,10 @@
 import json
 import os
+import time
 import warnings
 from openai import OpenAI
 from dotenv import load_dotenv, find_dotenv
+from llm_prompts import RUN_BUDGET, compact_json, estimate_tokens
 
 # Load environment variables from a .env file (if present). When you run
 # scripts from `src/` the project root `.env` may live one level up, so use
@@ -16,6 +18,10 @@ load_dotenv(find_dotenv())
 # valid OpenAI model identifier in their environment or .env.
 MODEL = os.getenv("LLM_MODEL", "qwen/qwen3-vl-4b")
 
+# Seconds before a chat request is abandoned (the OpenAI client default is
+# 600). mock_servers --timeout-seconds must exceed it to simulate a hang.
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "600"))
+
 
 # Configuration: prefer environment variables. This makes the repository
 # usable with either a local LLM (LM Studio / llm server) or the OpenAI API.
@@ -32,7 +38,7 @@ def _make_client():
     api_base = os.getenv("OPENAI_API_BASE")
 
     if local_base:
-        return OpenAI(base_url=local_base, api_key=local_key)
+        return OpenAI(base_url=local_base, api_key=local_key, timeout=TIMEOUT_SECONDS)
     if api_key:
         # Warn if the configured model looks like a non-OpenAI model id
         # (many third-party models use a group/name format with '/'). Using
@@ -48,15 +54,15 @@ def _make_client():
             )
         # The OpenAI client constructor accepts api_key and optional base
         if api_base:
-            return OpenAI(api_key=api_key, base_url=api_base)
-        return OpenAI(api_key=api_key)
+            return OpenAI(api_key=api_key, base_url=api_base, timeout=TIMEOUT_SECONDS)
+        return OpenAI(api_key=api_key, timeout=TIMEOUT_SECONDS)
 
     warnings.warn(
         "No OPENAI_API_KEY or LLM_LOCAL_BASE_URL set; defaulting to http://127.0.0.1:1234/v1. "
         "If you want to use the OpenAI cloud API, set OPENAI_API_KEY in your environment.",
         UserWarning,
     )
-    return OpenAI(base_url="http://127.0.0.1:1234/v1", api_key="lm-studio")
+    return OpenAI(base_url="http://127.0.0.1:1234/v1", api_key="lm-studio", timeout=TIMEOUT_SECONDS)
 
 
 CLIENT = _make_client()
@@ -71,15 +77,53 @@ SYSTEM_INSTRUCTIONS = (
 
 
 def prompt(nbim: dict, cust: dict, flags: dict) -> str:
+    """Per-break facts for classify_locally; instructions go in the system message."""
     return (
-        f"{SYSTEM_INSTRUCTIONS}\n\n"
-        f"Data:\nNBIM: {json.dumps(nbim, ensure_ascii=False)}\n"
-        f"Cust: {json.dumps(cust, ensure_ascii=False)}\n"
-        f"Flags: {json.dumps(flags, ensure_ascii=False)}\n"
-        f"Rules:\n- Respond with JSON only.\n"
+        f"NBIM:{compact_json(nbim)}\n"
+        f"Cust:{compact_json(cust)}\n"
+        f"Flags:{compact_json(flags)}"
     )
 
 
+def _chat(prompt_text: str, system: str = None, label: str = "llm", **kwargs):
+    """Send one chat request within RUN_BUDGET and record its token usage.
+
+    The stable system prompt goes first so the provider can cache the prefix.
+    Raises RuntimeError when the prompt is over the per-call limit or the run
+    budget is spent; callers turn that into their usual fallback.
+    """
+    messages = [{"role": "user", "content": prompt_text}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+
+    if prompt_tokens > RUN_BUDGET.per_call:
+        RUN_BUDGET.record(label, 0, 0, 0.0, estimated=True, skipped=True)
+        raise RuntimeError(f"prompt ~{prompt_tokens} tokens exceeds per-call limit {RUN_BUDGET.per_call}")
+    if not RUN_BUDGET.allows(prompt_tokens):
+        RUN_BUDGET.record(label, 0, 0, 0.0, estimated=True, skipped=True)
+        raise RuntimeError("run token budget exhausted")
+
+    start = time.perf_counter()
+    resp = CLIENT.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=0.0,
+        **kwargs,
+    )
+    elapsed = time.perf_counter() - start
+    text = resp.choices[0].message.content
+
+    usage = getattr(resp, "usage", None)
+    if usage is not None and usage.prompt_tokens is not None:
+        RUN_BUDGET.record(label, usage.prompt_tokens, usage.completion_tokens or 0,
+                          elapsed, estimated=False)
+    else:
+        RUN_BUDGET.record(label, prompt_tokens, estimate_tokens(text or ""),
+                          elapsed, estimated=True)
+    return text
+
+
 def classify_locally(nbim: dict, cust: dict, flags: dict) -> dict:
     """Return a minimal, robust classification dict.
 
@@ -88,13 +132,7 @@ def classify_locally(nbim: dict, cust: dict, flags: dict) -> dict:
     """
     msg = prompt(nbim, cust, flags)
     try:
-        resp = CLIENT.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": msg}],
-            temperature=0.0,
-            seed=42,
-        )
-        text = resp.choices[0].message.content
+        text = _chat(msg, system=SYSTEM_INSTRUCTIONS, label="classify", seed=42)
         if text is None:
             raise RuntimeError("LLM returned empty response")
         text = text.strip()
@@ -123,19 +161,15 @@ def classify_locally(nbim: dict, cust: dict, flags: dict) -> dict:
     return obj
 
 
-def call_llm(prompt_text: str) -> str:
+def call_llm(prompt_text: str, system: str = None, label: str = "llm") -> str:
     """Send a free-text prompt to the configured LLM and return the raw text reply.
 
     This helper is useful for summary/insight prompts that don't fit the
-    structured classify_locally(nbim,cust,flags) signature.
+    structured classify_locally(nbim,cust,flags) signature. Pass the agent's
+    fixed instructions as `system` and only the per-call facts as `prompt_text`.
     """
     try:
-        resp = CLIENT.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt_text}],
-            temperature=0.0,
-        )
-        text = resp.choices[0].message.content
+        text = _chat(prompt_text, system=system, label=label)
         if text is None:
             return ""
         return text.strip()
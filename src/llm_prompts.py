@@ -0,0 +1,174 @@
+"""Shared prompt building and token accounting for the LLM agents.
+
+Each agent keeps its instructions in a module-level system prompt that never
+changes between calls, so providers that cache prompt prefixes can reuse it,
+and sends the per-call facts as compact JSON in the user message. Facts drop
+null fields. When they would exceed the per-call budget, the lowest-priority
+items are left out first; free text passed along (the summary fed to the email
+agent) is truncated to a share of the budget so the top facts still fit.
+
+TokenBudget (RUN_BUDGET) counts prompt and completion tokens and latency for
+every call in the run. call_llm checks it before sending.
+
+    LLM_MAX_PROMPT_TOKENS   per-call prompt limit (default 6000)
+    LLM_RUN_TOKEN_BUDGET    total prompt + completion tokens per run (default unlimited)
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Without a tokenizer for every provider, ~4 characters per token is the
+# usual estimate for English/JSON text. Real providers report their own usage;
+# mock_servers uses this same estimate for its usage counts.
+CHARS_PER_TOKEN = 4
+
+# Headroom kept in every call for estimate rounding and short notes
+RESERVE_TOKENS = 32
+
+PRIORITY_RANK = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def _is_null(value) -> bool:
+    if value is None:
+        return True
+    try:
+        return bool(value != value)     # NaN
+    except (TypeError, ValueError):
+        return True                     # pd.NA / NaT refuse to compare
+
+
+def _compact(value):
+    if isinstance(value, dict):
+        return {k: _compact(v) for k, v in value.items() if not _is_null(v)}
+    if isinstance(value, (list, tuple)):
+        return [_compact(v) for v in value if not _is_null(v)]
+    if hasattr(value, "item"):          # numpy scalar -> Python scalar
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def compact_json(obj) -> str:
+    """JSON with null/NaN fields removed and no whitespace."""
+    return json.dumps(_compact(obj), ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def truncate_text(text: str, max_tokens: int, marker: str = "\n[... truncated]") -> str:
+    """Cut `text` to about `max_tokens`, at a line break where possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens * CHARS_PER_TOKEN - len(marker))
+    cut = text[:keep]
+    if "\n" in cut:
+        cut = cut[:cut.rindex("\n")]
+    return cut + marker if keep else ""
+
+
+def _cash_impact(item: Dict[str, Any]) -> float:
+    """Sort key for cash impact; missing or NaN (both amounts unknown) count as 0."""
+    value = item.get("cash_impact")
+    return 0.0 if _is_null(value) else float(value)
+
+
+def rank_items(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Most important first: priority, then cash impact."""
+    return sorted(
+        items,
+        key=lambda i: (PRIORITY_RANK.get(i.get("priority"), len(PRIORITY_RANK)),
+                       -_cash_impact(i)),
+    )
+
+
+def fit_items(items: List[Dict[str, Any]], max_tokens: int) -> Tuple[str, int]:
+    """Serialize the highest-ranked items that fit in `max_tokens`.
+
+    Returns (json_text, number_of_items_dropped).
+    """
+    ranked = rank_items(items)
+    lo, hi = 0, len(ranked)
+    # largest prefix of the ranked list that fits
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(compact_json(ranked[:mid])) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return compact_json(ranked[:lo]), len(ranked) - lo
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+class TokenBudget:
+    """Per-call and per-run token limits plus usage accounting."""
+
+    def __init__(self, per_call: Optional[int] = None, per_run: Optional[int] = None):
+        self.per_call = per_call if per_call is not None else _env_int("LLM_MAX_PROMPT_TOKENS", 6000)
+        self.per_run = per_run if per_run is not None else _env_int("LLM_RUN_TOKEN_BUDGET", None)
+        self.calls: List[Dict[str, Any]] = []
+
+    @property
+    def used(self) -> int:
+        return sum(c["prompt_tokens"] + c["completion_tokens"] for c in self.calls)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(c["prompt_tokens"] for c in self.calls)
+
+    def available(self, *fixed_texts: str) -> int:
+        """Tokens left in one call for facts after the fixed texts.
+
+        Keeps a small reserve for rounding and short notes added afterwards.
+        """
+        return self.per_call - sum(estimate_tokens(t) for t in fixed_texts) - RESERVE_TOKENS
+
+    def allows(self, prompt_tokens: int) -> bool:
+        """Whether a call with this many prompt tokens fits the remaining run budget."""
+        return self.per_run is None or self.used + prompt_tokens <= self.per_run
+
+    def record(self, label: str, prompt_tokens: int, completion_tokens: int,
+               seconds: float, estimated: bool, skipped: bool = False):
+        self.calls.append({
+            "label": label,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "seconds": round(seconds, 3),
+            "estimated": estimated,
+            "skipped": skipped,
+        })
+
+    def report(self, n_breaks: Optional[int] = None) -> str:
+        run = f"{self.per_run} tokens" if self.per_run is not None else "unlimited"
+        lines = [f"LLM token usage (per call limit: {self.per_call}, run budget: {run})"]
+        by_label: Dict[str, Dict[str, float]] = {}
+        for c in self.calls:
+            agg = by_label.setdefault(c["label"], {"calls": 0, "skipped": 0, "prompt": 0,
+                                                   "completion": 0, "seconds": 0.0})
+            agg["calls"] += 1
+            agg["skipped"] += c["skipped"]
+            agg["prompt"] += c["prompt_tokens"]
+            agg["completion"] += c["completion_tokens"]
+            agg["seconds"] += c["seconds"]
+        for label, agg in by_label.items():
+            per_token = agg["seconds"] / agg["completion"] * 1000 if agg["completion"] else 0.0
+            lines.append(
+                f"  {label:<14} {agg['calls']:>4} calls ({agg['skipped']} skipped)  "
+                f"prompt {agg['prompt']:>8}  completion {agg['completion']:>7}  "
+                f"{agg['seconds']:>7.2f}s  {per_token:.1f} ms/completion token"
+            )
+        lines.append(f"  total          {self.used} tokens")
+        if n_breaks:
+            lines.append(f"  prompt tokens per break: {self.prompt_tokens / n_breaks:.1f}")
+        if any(c["estimated"] and not c["skipped"] for c in self.calls):
+            lines.append("  (some counts estimated: provider returned no usage)")
+        return "\n".join(lines)
+
+
+RUN_BUDGET = TokenBudget()
@@ -0,0 +1,350 @@
+"""Local stand-ins for the OpenAI-compatible LLM and the Norges Bank EXR API.
+
+Lets the pipeline run, and be load/latency tested, without network access:
+
+    python mock_servers.py --latency lognormal:0.3,0.5 --error-rate 0.05
+    LLM_LOCAL_BASE_URL=http://127.0.0.1:1234/v1 \
+    NORGES_BANK_BASE_URL=http://127.0.0.1:8765/api python recon_run.py
+
+Both servers use the same fault model (see MockConfig): a latency
+distribution, an error rate answered with one configurable HTTP status
+(--error-status, default 500; use 429 to exercise client retries), and a
+timeout rate where the request hangs for --timeout-seconds and the
+connection then closes without a reply. That only looks like a timeout to
+the client if --timeout-seconds exceeds the client's own timeout: 10 s for
+the Norges Bank requests, LLM_TIMEOUT_SECONDS (default 600) for the LLM.
+Each server has its own
+config, seeded RNG and counters, so LLM and FX throughput are measured
+separately; --fx-latency, --llm-error-rate etc. override the shared flags
+for one endpoint. GET /stats on a server returns that server's own
+request, error, timeout and token counters as JSON.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+from llm_prompts import estimate_tokens
+
+# Canned market rates (quote per 1 unit of base, or per 100 for the
+# currencies fx_market_agent normalizes) returned by the mock EXR endpoint.
+DEFAULT_FX_RATES = {
+    ("USD", "NOK"): 10.4266,
+    ("EUR", "NOK"): 11.6950,
+    ("GBP", "NOK"): 13.7520,
+    ("SEK", "NOK"): 1.0612,
+    ("CAD", "NOK"): 7.5240,
+    ("CHF", "NOK"): 1256.93,
+    ("JPY", "NOK"): 7.0125,
+    ("KRW", "NOK"): 0.7243,
+}
+
+# Canned chat replies, picked by the first marker found in the prompt.
+DEFAULT_LLM_RESPONSES = {
+    "root_cause_hypothesis": json.dumps({
+        "root_cause_hypothesis": "Custodian applied a stale or default FX rate.",
+        "is_systematic": True,
+        "process_improvement": "Source FX from Norges Bank fixing at booking time.",
+        "confidence": 0.8,
+    }),
+    "Allowed labels": json.dumps({
+        "label": "fx_mismatch",
+        "reason": "FX rates differ beyond tolerance.",
+        "action": "Confirm rate with custodian.",
+        "confidence": 0.8,
+    }),
+    "Subject:": (
+        "Subject: Reconciliation — Top FX Corrections (24h)\n"
+        "To: FX Reconciliation Team\nCc:\n---\n"
+        "Mock email body generated by mock_servers.py.\n\nBest,\nMock"
+    ),
+    "": "## FX Correction Decisions\n\nMock summary generated by mock_servers.py.",
+}
+
+
+LATENCY_PARAMS = {"fixed": (0, 1), "uniform": (2, 2), "normal": (2, 2), "lognormal": (2, 2)}
+
+
+def parse_latency(spec: str):
+    """Split 'kind:a,b' into (kind, [a, b]); ValueError if it is not valid."""
+    kind, _, params = spec.partition(":")
+    if kind not in LATENCY_PARAMS:
+        raise ValueError(f"Unknown latency distribution {kind!r} in {spec!r}; "
+                         f"choose one of {sorted(LATENCY_PARAMS)}")
+    try:
+        args = [float(p) for p in params.split(",") if p.strip()]
+    except ValueError:
+        raise ValueError(f"Latency parameters must be numbers: {spec!r}") from None
+    low, high = LATENCY_PARAMS[kind]
+    if not low <= len(args) <= high:
+        raise ValueError(f"Latency {kind!r} takes {high} parameter(s), got {len(args)}: {spec!r}")
+    return kind, args
+
+
+def _latency_arg(spec: str) -> str:
+    try:
+        parse_latency(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return spec
+
+
+@dataclass
+class MockConfig:
+    latency: str = "fixed:0"            # fixed:S | uniform:A,B | normal:MU,SIGMA | lognormal:MU,SIGMA
+    error_rate: float = 0.0             # share of requests answered with an HTTP error
+    error_status: int = 500
+    timeout_rate: float = 0.0           # share of requests that hang for timeout_seconds
+    timeout_seconds: float = 30.0
+    seed: int = 42
+    llm_responses: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_LLM_RESPONSES))
+    fx_rates: Dict[tuple, float] = field(default_factory=lambda: dict(DEFAULT_FX_RATES))
+
+    def __post_init__(self):
+        # fail at startup rather than inside a request handler
+        self.latency_kind, self.latency_args = parse_latency(self.latency)
+
+
+class MockState:
+    """One server's seeded RNG and counters, shared by its handler threads."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0, "errors": 0, "timeouts": 0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+        }
+
+    def sample_latency(self) -> float:
+        kind, args = self.config.latency_kind, self.config.latency_args
+        with self.lock:
+            if kind == "fixed":
+                value = args[0] if args else 0.0
+            elif kind == "uniform":
+                value = self.rng.uniform(*args)
+            elif kind == "normal":
+                value = self.rng.gauss(*args)
+            else:
+                value = self.rng.lognormvariate(*args)
+        return max(value, 0.0)
+
+    def draw_fault(self) -> Optional[str]:
+        """Return 'timeout', 'error' or None for the next request."""
+        with self.lock:
+            roll = self.rng.random()
+        if roll < self.config.timeout_rate:
+            return "timeout"
+        if roll < self.config.timeout_rate + self.config.error_rate:
+            return "error"
+        return None
+
+    def count(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _apply_faults(self) -> bool:
+        """Sleep for the sampled latency; return True if a fault was sent."""
+        self.state.count(requests=1)
+        time.sleep(self.state.sample_latency())
+        fault = self.state.draw_fault()
+        if fault == "timeout":
+            self.state.count(timeouts=1)
+            time.sleep(self.state.config.timeout_seconds)
+            return True
+        if fault == "error":
+            self.state.count(errors=1)
+            self._send_json(self.state.config.error_status,
+                            {"error": {"message": "injected error", "type": "mock_error"}})
+            return True
+        return False
+
+    def _send_stats(self):
+        with self.state.lock:
+            self._send_json(200, dict(self.state.stats))
+
+
+class ChatCompletionsHandler(_MockHandler):
+    """POST /v1/chat/completions in the OpenAI response shape."""
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.endswith("/stats"):
+            return self._send_stats()
+        if path.endswith("/models"):
+            return self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if not path.endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self._apply_faults():
+            return
+
+        contents = [str(m.get("content", "")) for m in request.get("messages", [])]
+        prompt = "\n".join(contents)
+        content = next(
+            (reply for marker, reply in self.state.config.llm_responses.items()
+             if marker in prompt),
+            DEFAULT_LLM_RESPONSES[""],
+        )
+        # counted per message, as llm_client estimates when usage is missing
+        prompt_tokens = sum(estimate_tokens(c) for c in contents)
+        completion_tokens = estimate_tokens(content)
+        self.state.count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{self.state.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+class NorgesBankHandler(_MockHandler):
+    """GET /api/data/EXR/B.{BASE}.{QUOTE}.SP in the SDMX-JSON shape."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/stats"):
+            return self._send_stats()
+
+        parts = url.path.rstrip("/").split("/")
+        if len(parts) < 2 or parts[-2] != "EXR":
+            return self._send_json(404, {"errors": [{"message": f"unknown path {url.path}"}]})
+        key = parts[-1].split(".")
+        if len(key) != 4:
+            return self._send_json(400, {"errors": [{"message": f"bad series key {parts[-1]}"}]})
+        if self._apply_faults():
+            return
+
+        _, base, quote, _ = (k.upper() for k in key)
+        rate = self.state.config.fx_rates.get((base, quote))
+        if rate is None:
+            return self._send_json(404, {"errors": [{"message": f"no data for {base}/{quote}"}]})
+
+        period = parse_qs(url.query).get("startPeriod", ["2025-04-25"])[0]
+        self._send_json(200, {
+            "data": {
+                "dataSets": [{
+                    "series": {"0:0:0:0": {"observations": {"0": [str(rate)]}}},
+                }],
+                "structure": {
+                    "dimensions": {"observation": [{"id": "TIME_PERIOD", "values": [{"id": period}]}]},
+                },
+            },
+        })
+
+
+def make_server(handler_cls, host: str, port: int, state: MockState) -> ThreadingHTTPServer:
+    handler = type(handler_cls.__name__, (handler_cls,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_mock_servers(config: MockConfig = None, host: str = "127.0.0.1",
+                       llm_port: int = 1234, fx_port: int = 8765,
+                       fx_config: MockConfig = None):
+    """Start both servers on background threads; return (llm_server, fx_server).
+
+    `config` applies to the LLM server, and to the FX server unless
+    `fx_config` is given. Each server gets its own MockState either way.
+    Pass port 0 to bind a free port; read it back from server.server_address.
+    """
+    config = config or MockConfig()
+    servers = (
+        make_server(ChatCompletionsHandler, host, llm_port, MockState(config)),
+        make_server(NorgesBankHandler, host, fx_port, MockState(fx_config or config)),
+    )
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+FAULT_FLAGS = {
+    "latency": dict(type=_latency_arg, default="fixed:0",
+                    help="fixed:S | uniform:A,B | normal:MU,SIGMA | lognormal:MU,SIGMA (seconds)"),
+    "error-rate": dict(type=float, default=0.0),
+    "error-status": dict(type=int, default=500),
+    "timeout-rate": dict(type=float, default=0.0),
+    "timeout-seconds": dict(type=float, default=30.0),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--llm-port", type=int, default=1234)
+    parser.add_argument("--fx-port", type=int, default=8765)
+    for flag, options in FAULT_FLAGS.items():
+        parser.add_argument(f"--{flag}", **options)
+        # per-endpoint overrides default to the shared value
+        for endpoint in ("llm", "fx"):
+            parser.add_argument(f"--{endpoint}-{flag}", type=options["type"], default=None,
+                                help=f"override --{flag} for the {endpoint} server")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--responses", help="JSON file mapping prompt marker -> canned reply")
+    args = parser.parse_args()
+
+    def endpoint_config(endpoint: str) -> MockConfig:
+        values = {}
+        for flag in FAULT_FLAGS:
+            name = flag.replace("-", "_")
+            override = getattr(args, f"{endpoint}_{name}")
+            values[name] = override if override is not None else getattr(args, name)
+        return MockConfig(seed=args.seed, **values)
+
+    llm_config, fx_config = endpoint_config("llm"), endpoint_config("fx")
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            custom = json.load(f)
+        # custom markers win; the catch-all "" marker stays last
+        defaults = {k: v for k, v in llm_config.llm_responses.items() if k not in custom}
+        llm_config.llm_responses = {**custom, **defaults}
+        llm_config.llm_responses[""] = llm_config.llm_responses.pop("")
+
+    llm, fx = start_mock_servers(llm_config, args.host, args.llm_port, args.fx_port,
+                                 fx_config=fx_config)
+    print(f"Mock LLM:          http://{args.host}:{llm.server_address[1]}/v1")
+    print(f"Mock Norges Bank:  http://{args.host}:{fx.server_address[1]}/api")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
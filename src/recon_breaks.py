@@ -1,29 +1,123 @@
 import numpy as np
 import pandas as pd
 
+# Tolerances for np.isclose-style comparison of each NBIM/custody field pair.
+# Every recon engine reads these so the break flags agree across backends.
+BREAK_RTOL = 1e-4
+BREAK_ATOL = 1e-2
+BREAK_FIELDS = {
+    "break_tax": ("tax_rate_nbim", "tax_rate_cust"),
+    "break_fx": ("fx_nbim", "fx_cust"),
+    "break_gross": ("gross_nbim", "gross_cust"),
+    "break_net": ("net_nbim", "net_cust"),
+}
+
+# FX and tax breaks escalate at lower cash impact due to systemic risk
+SYSTEMIC_PRIORITY_THRESHOLDS = [(50000, 'CRITICAL'), (5000, 'HIGH')]
+PRIORITY_THRESHOLDS = [(100000, 'CRITICAL'), (10000, 'HIGH'), (1000, 'MEDIUM')]
+
+
+# Columns build_break_labels reads; every engine hands over exactly these
+LABEL_INPUT_COLUMNS = list(BREAK_FIELDS) + [c for pair in BREAK_FIELDS.values() for c in pair]
+
+
+def format_number(value) -> str:
+    """Label text for a reported value, as the original row-wise labels wrote it.
+
+    Integers print as integers ("22"), floats as their Python repr ("22.0",
+    "1.234e-05"), missing values as "nan". Whether a value is an integer is
+    decided by the column dtype the loader produced, not by the value, so
+    20.0 in a float column stays "20.0".
+    """
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    value = float(value)
+    return "nan" if value != value else repr(value)
+
+
+def format_rounded(value) -> str:
+    """Label text for an amount difference, rounded to whole units."""
+    return f"{float(value):.0f}"
+
+
+def _format_masked(values: np.ndarray, mask: np.ndarray, formatter) -> np.ndarray:
+    """Text for values[mask], formatting each distinct value once."""
+    uniq, inverse = np.unique(values[mask], return_inverse=True)
+    return np.array([formatter(v) for v in uniq], dtype=object)[inverse.ravel()]
+
+
+def build_break_labels(cols: dict) -> np.ndarray:
+    """break_label for every row from the flag and value arrays in `cols`.
+
+    Shared by all recon engines so labels are identical whatever library
+    produced the columns. Integer arrays format as integers, so engines must
+    hand over a column as integers exactly when pandas would load it as
+    int64 (numeric and no missing values). Works on whole columns; only
+    broken rows are formatted.
+    """
+    v = {c: np.asarray(cols[c]) for c in LABEL_INPUT_COLUMNS if c not in BREAK_FIELDS}
+    diffs = {a: v[a].astype(np.float64) - v[b].astype(np.float64)
+         for a, b in (("gross_nbim", "gross_cust"), ("net_nbim", "net_cust"))}
+    reasons = [
+        ("break_tax", lambda m: "tax_rate_diff:" + _format_masked(v["tax_rate_nbim"], m, format_number)
+                                + "vs" + _format_masked(v["tax_rate_cust"], m, format_number)),
+        ("break_fx", lambda m: "fx_diff:" + _format_masked(v["fx_nbim"], m, format_number)
+                               + "vs" + _format_masked(v["fx_cust"], m, format_number)),
+        ("break_gross", lambda m: "gross_diff:" + _format_masked(diffs["gross_nbim"], m, format_rounded)),
+        ("break_net", lambda m: "net_diff:" + _format_masked(diffs["net_nbim"], m, format_rounded)),
+    ]
+    labels = np.full(len(cols["break_tax"]), "", dtype=object)
+    for flag, text in reasons:
+        mask = np.asarray(cols[flag], dtype=bool)
+        if not mask.any():
+            continue
+        current = labels[mask]
+        labels[mask] = np.where(current == "", "", current + " | ") + text(mask)
+    labels[labels == ""] = "ok"
+    return labels
+
+
 def classify_breaks(df: pd.DataFrame) -> pd.DataFrame:
-    """Pure deterministic break detection - no LLM"""
-    out = df.copy()
+    """Pure deterministic break detection - no LLM
+
+    Adds the break_* flags and break_label to `df` in place and returns it.
+    """
+    out = df
     
     # Your existing comparison logic
-    out["break_tax"] = ~np.isclose(out["tax_rate_nbim"], out["tax_rate_cust"], rtol=1e-4, atol=1e-2)
-    out["break_fx"] = ~np.isclose(out["fx_nbim"], out["fx_cust"], rtol=1e-4, atol=1e-2)
-    out["break_gross"] = ~np.isclose(out["gross_nbim"], out["gross_cust"], rtol=1e-4, atol=1e-2)
-    out["break_net"] = ~np.isclose(out["net_nbim"], out["net_cust"], rtol=1e-4, atol=1e-2)
+    for flag, (a, b) in BREAK_FIELDS.items():
+        out[flag] = ~np.isclose(out[a], out[b], rtol=BREAK_RTOL, atol=BREAK_ATOL)
     
     # Enhanced break labeling
-    def label_break(row):
-        reasons = []
-        if row["break_tax"]: 
-            reasons.append(f"tax_rate_diff:{row['tax_rate_nbim']}vs{row['tax_rate_cust']}")
-        if row["break_fx"]: 
-            reasons.append(f"fx_diff:{row['fx_nbim']}vs{row['fx_cust']}")
-        if row["break_gross"]: 
-            reasons.append(f"gross_diff:{row['gross_nbim']-row['gross_cust']:.0f}")
-        if row["break_net"]: 
-            reasons.append(f"net_diff:{row['net_nbim']-row['net_cust']:.0f}")
-            
-        return " | ".join(reasons) if reasons else "ok"
+    out["break_label"] = build_break_labels(
+        {c: out[c].to_numpy() for c in LABEL_INPUT_COLUMNS}
+    )
+    return out
+
+
+def prioritize_breaks(breaks: pd.DataFrame) -> pd.DataFrame:
+    """Attach cash_impact and priority to classified breaks - no LLM
+
+    cash_impact is the larger of |gross diff| and |net diff|. A diff with a
+    missing amount on either side is unknown and ignored; if both are unknown
+    cash_impact is NaN and priority falls through to LOW. PolarsEngine
+    applies the same rule.
+    """
+    # Enhanced cash impact calculation
+    gross_diff = (breaks['gross_nbim'] - breaks['gross_cust']).abs().to_numpy(dtype=np.float64)
+    net_diff = (breaks['net_nbim'] - breaks['net_cust']).abs().to_numpy(dtype=np.float64)
+    breaks['cash_impact'] = np.fmax(gross_diff, net_diff)
     
-    out["break_label"] = out.apply(label_break, axis=1)
-    return out
\ No newline at end of file
+    # Enhanced priority - categorize ALL breaks, not just filtering.
+    # FX and tax breaks are higher priority due to systemic risk.
+    cash_impact = breaks['cash_impact'].to_numpy()
+    if 'break_label' in breaks.columns:
+        systemic = breaks['break_label'].str.contains('fx|tax', case=False, na=False).to_numpy()
+    else:
+        systemic = np.zeros(len(breaks), dtype=bool)
+    conditions = [systemic & (cash_impact > t) for t, _ in SYSTEMIC_PRIORITY_THRESHOLDS]
+    conditions += [cash_impact > t for t, _ in PRIORITY_THRESHOLDS]
+    levels = [p for _, p in SYSTEMIC_PRIORITY_THRESHOLDS + PRIORITY_THRESHOLDS]
+    breaks['priority'] = np.select(conditions, levels, default='LOW').astype(object)
+
+    return breaks
@@ -0,0 +1,231 @@
+"""DataFrame engines for the deterministic recon core.
+
+Load, normalize, join, classify and prioritize run through an engine so the
+same pipeline can execute on different DataFrame libraries. `PandasEngine`
+wraps the existing recon_loader / recon_breaks functions and is the
+reference; `PolarsEngine` builds the same steps as one lazy Polars query and
+collects it with the streaming engine.
+
+Every engine returns a pandas DataFrame from `analyze()` so the LLM agents
+downstream stay unchanged. The pandas engine enriches one frame in place
+from the join onwards. For Polars the stages only build the plan, so the
+work (and memory) shows up under "collect". Pick an engine with RECON_ENGINE=pandas|polars.
+"""
+import os
+
+import pandas as pd
+
+from recon_loader import (
+    NBIM_RENAME, NBIM_COLUMNS, NBIM_NUMERIC, NBIM_OPTIONAL,
+    CUSTODY_RENAME, CUSTODY_COLUMNS, CUSTODY_NUMERIC, CUSTODY_OPTIONAL,
+    JOIN_KEYS, DIFF_PAIRS,
+    load_nbim_csv, load_custody_csv, align_frames,
+)
+from recon_breaks import (
+    BREAK_RTOL, BREAK_ATOL, BREAK_FIELDS,
+    SYSTEMIC_PRIORITY_THRESHOLDS, PRIORITY_THRESHOLDS,
+    LABEL_INPUT_COLUMNS, build_break_labels,
+    classify_breaks, prioritize_breaks,
+)
+from recon_memory import MemoryTracker
+
+
+class ReconEngine:
+    """Base class: one method per deterministic stage."""
+
+    name = "base"
+
+    def load_nbim(self, path: str):
+        raise NotImplementedError
+
+    def load_custody(self, path: str):
+        raise NotImplementedError
+
+    def align(self, nbim, custody):
+        raise NotImplementedError
+
+    def classify(self, df):
+        raise NotImplementedError
+
+    def prioritize(self, df):
+        raise NotImplementedError
+
+    def to_pandas(self, df) -> pd.DataFrame:
+        return df
+
+    def analyze(self, nbim_path: str, custody_path: str, tracker: MemoryTracker = None) -> pd.DataFrame:
+        """Run load -> align -> classify -> prioritize and return pandas.
+
+        Pass a MemoryTracker to record memory per stage.
+        """
+        tracker = tracker or MemoryTracker()
+        with tracker.stage("load"):
+            nbim = self.load_nbim(nbim_path)
+            custody = self.load_custody(custody_path)
+        with tracker.stage("align"):
+            merged = self.align(nbim, custody)
+            del nbim, custody
+        with tracker.stage("classify"):
+            merged = self.classify(merged)
+        with tracker.stage("prioritize"):
+            merged = self.prioritize(merged)
+        with tracker.stage("collect"):
+            return self.to_pandas(merged)
+
+
+class PandasEngine(ReconEngine):
+    """Reference implementation - the original pandas code path."""
+
+    name = "pandas"
+
+    def load_nbim(self, path: str) -> pd.DataFrame:
+        return load_nbim_csv(path)
+
+    def load_custody(self, path: str) -> pd.DataFrame:
+        return load_custody_csv(path)
+
+    def align(self, nbim: pd.DataFrame, custody: pd.DataFrame) -> pd.DataFrame:
+        return align_frames(nbim, custody)
+
+    def classify(self, df: pd.DataFrame) -> pd.DataFrame:
+        return classify_breaks(df)
+
+    def prioritize(self, df: pd.DataFrame) -> pd.DataFrame:
+        return prioritize_breaks(df)
+
+
+def _import_polars():
+    try:
+        import polars as pl
+    except ImportError as e:
+        raise ImportError(
+            "RECON_ENGINE=polars requires the 'polars' package (pip install polars)"
+        ) from e
+    return pl
+
+
+class PolarsEngine(ReconEngine):
+    """Arrow-native backend: a single lazy Polars plan, collected once.
+
+    Identifier columns are cast to strings, as recon_loader does with
+    astype(str). break_label is built by recon_breaks.build_break_labels,
+    the same function the pandas engine uses, so labels match exactly. That
+    step is a Python callback per batch and holds the GIL, so labelling is
+    single-threaded; the rest of the plan runs on all cores.
+    """
+
+    name = "polars"
+
+    def __init__(self, streaming: bool = True):
+        self.pl = _import_polars()
+        self.streaming = streaming
+
+    def _scan(self, path: str, rename: dict, columns: list, numeric: list, optional: list):
+        pl = self.pl
+        lf = pl.scan_csv(path, separator=';')
+        # Strip a UTF-8 BOM from the first header if the reader kept it
+        lf = lf.rename({c: c.lstrip('\ufeff') for c in lf.collect_schema().names()
+                        if c.startswith('\ufeff')})
+        lf = lf.rename({k: v for k, v in rename.items() if k in lf.collect_schema().names()})
+
+        names = lf.collect_schema().names()
+        missing = [c for c in columns if c not in names]
+        if missing:
+            raise ValueError(f"CSV {path} missing columns needed for per-leg match: {missing}")
+        present = [c for c in optional if c in names]
+        columns = columns + present
+        numeric = numeric + present
+
+        schema = lf.select(columns).collect_schema()
+        exprs = []
+        for c in columns:
+            col = pl.col(c)
+            if c in numeric:
+                # equivalent of pd.to_numeric(errors='coerce')
+                if schema[c] == pl.Utf8:
+                    col = col.cast(pl.Float64, strict=False)
+            elif c in ('isin', 'quotation_currency', 'settlement_currency'):
+                col = col.cast(pl.Utf8).str.to_uppercase().str.strip_chars()
+            else:
+                col = col.cast(pl.Utf8).str.strip_chars()
+            exprs.append(col.alias(c))
+        return lf.select(exprs)
+
+    def load_nbim(self, path: str):
+        return self._scan(path, NBIM_RENAME, NBIM_COLUMNS, NBIM_NUMERIC, NBIM_OPTIONAL)
+
+    def load_custody(self, path: str):
+        return self._scan(path, CUSTODY_RENAME, CUSTODY_COLUMNS, CUSTODY_NUMERIC, CUSTODY_OPTIONAL)
+
+    def align(self, nbim, custody):
+        pl = self.pl
+        merged = nbim.join(custody, on=JOIN_KEYS, how='inner', maintain_order='left')
+        return merged.with_columns([
+            (pl.col(a) - pl.col(b)).alias(f'{a}_minus_{b}') for a, b in DIFF_PAIRS
+        ])
+
+    def classify(self, df):
+        pl = self.pl
+        df = df.with_columns([
+            (~(
+                ((pl.col(a) - pl.col(b)).abs() <= BREAK_ATOL + BREAK_RTOL * pl.col(b).abs())
+                & pl.col(a).cast(pl.Float64).is_not_nan()
+                & pl.col(b).cast(pl.Float64).is_not_nan()
+            ).fill_null(False)).alias(flag)
+            for flag, (a, b) in BREAK_FIELDS.items()
+        ])
+        # Labels come from the same builder as the pandas engine, batch by
+        # batch. pandas loads a column as int64 only when it has no missing
+        # values, so an integer column with nulls is handed over as floats.
+        schema = df.collect_schema()
+        values = [c for c in LABEL_INPUT_COLUMNS if c not in BREAK_FIELDS]
+        as_int = [c for c in values if schema[c].is_integer()]
+        inputs = pl.struct(
+            [pl.col(c) for c in LABEL_INPUT_COLUMNS]
+            + [(pl.col(c).null_count() == 0).alias(f'{c}__as_int') for c in as_int]
+        )
+
+        def labels(s):
+            cols = {c: s.struct.field(c).to_numpy() for c in LABEL_INPUT_COLUMNS}
+            for c in values:
+                if c not in as_int or not s.struct.field(f'{c}__as_int')[0]:
+                    cols[c] = cols[c].astype('float64')
+            return pl.Series(build_break_labels(cols), dtype=pl.Utf8)
+
+        label = inputs.map_batches(labels, return_dtype=pl.Utf8, is_elementwise=True)
+        return df.with_columns(label.alias('break_label'))
+
+    def prioritize(self, df):
+        pl = self.pl
+        # Same null rule as prioritize_breaks: unknown diffs are ignored,
+        # both unknown -> null cash_impact (NaN in pandas) and LOW priority
+        gross = (pl.col('gross_nbim') - pl.col('gross_cust')).abs().cast(pl.Float64).fill_nan(None)
+        net = (pl.col('net_nbim') - pl.col('net_cust')).abs().cast(pl.Float64).fill_nan(None)
+        df = df.with_columns(pl.max_horizontal(gross, net).alias('cash_impact'))
+
+        systemic = pl.col('break_label').str.to_lowercase().str.contains('fx|tax')
+        cash = pl.col('cash_impact')
+        priority = pl
+        for threshold, level in SYSTEMIC_PRIORITY_THRESHOLDS:
+            priority = priority.when(systemic & (cash > threshold)).then(pl.lit(level))
+        for threshold, level in PRIORITY_THRESHOLDS:
+            priority = priority.when(cash > threshold).then(pl.lit(level))
+        return df.with_columns(priority.otherwise(pl.lit('LOW')).alias('priority'))
+
+    def to_pandas(self, df) -> pd.DataFrame:
+        engine = 'streaming' if self.streaming else 'auto'
+        return df.collect(engine=engine).to_pandas()
+
+
+ENGINES = {
+    PandasEngine.name: PandasEngine,
+    PolarsEngine.name: PolarsEngine,
+}
+
+
+def get_engine(name: str = None) -> ReconEngine:
+    """Return the engine named by `name` or the RECON_ENGINE env var (default pandas)."""
+    name = (name or os.getenv("RECON_ENGINE", "pandas")).lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown RECON_ENGINE {name!r}; choose one of {sorted(ENGINES)}")
+    return ENGINES[name]()
@@ -1,28 +1,74 @@
 import pandas as pd
 from pathlib import Path
 
+# Column mappings shared by every recon engine (see recon_engine.py) so the
+# pandas reference and the alternative backends agree on names and keys.
+NBIM_RENAME = {
+    'COAC_EVENT_KEY': 'event_key',
+    'ISIN': 'isin',
+    'ORGANISATION_NAME': 'organisation',
+    'BANK_ACCOUNT': 'bank_account',             # keep per-leg key
+    'GROSS_AMOUNT_QUOTATION': 'gross_nbim',
+    'NET_AMOUNT_QUOTATION': 'net_nbim',
+    'WTHTAX_RATE': 'tax_rate_nbim',
+    'AVG_FX_RATE_QUOTATION_TO_PORTFOLIO': 'fx_nbim',
+    'QUOTATION_CURRENCY': 'quotation_currency',
+    'SETTLEMENT_CURRENCY': 'settlement_currency',
+    # inputs for recomputing amounts (recon_recompute.py)
+    'DIVIDENDS_PER_SHARE': 'dps_nbim',
+    'NOMINAL_BASIS': 'nominal_nbim',
+    'WTHTAX_COST_QUOTATION': 'wht_nbim',
+    'LOCALTAX_COST_QUOTATION': 'localtax_nbim',
+    'NET_AMOUNT_SETTLEMENT': 'net_sc_nbim',
+}
+# keep currency columns too so we can detect cross-currency cases later
+NBIM_COLUMNS = ['event_key','isin','organisation','bank_account',
+                'gross_nbim','net_nbim','tax_rate_nbim','fx_nbim',
+                'quotation_currency','settlement_currency']
+NBIM_NUMERIC = ['gross_nbim','net_nbim','tax_rate_nbim','fx_nbim']
+# kept (as numbers) when the feed carries them
+NBIM_OPTIONAL = ['dps_nbim','nominal_nbim','wht_nbim','localtax_nbim','net_sc_nbim']
+
+CUSTODY_RENAME = {
+    'COAC_EVENT_KEY': 'event_key',
+    'ISIN': 'isin',
+    # some feeds use BANK_ACCOUNTS (plural) — normalize to bank_account
+    'BANK_ACCOUNTS': 'bank_account',
+    'BANK_ACCOUNT': 'bank_account',
+    'GROSS_AMOUNT': 'gross_cust',
+    'NET_AMOUNT_QC': 'net_cust',
+    'TAX_RATE': 'tax_rate_cust',
+    'FX_RATE': 'fx_cust',
+    'CURRENCIES': 'quotation_currency',
+    'SETTLED_CURRENCY': 'settlement_currency',
+    # inputs for recomputing amounts (recon_recompute.py)
+    'DIV_RATE': 'dps_cust',
+    'NOMINAL_BASIS': 'nominal_cust',
+    'HOLDING_QUANTITY': 'holding_cust',
+    'LOAN_QUANTITY': 'loan_cust',
+    'TAX': 'wht_cust',
+    'NET_AMOUNT_SC': 'net_sc_cust',
+}
+CUSTODY_COLUMNS = ['event_key','isin','bank_account','gross_cust','net_cust','tax_rate_cust','fx_cust']
+CUSTODY_NUMERIC = ['gross_cust','net_cust','tax_rate_cust','fx_cust']
+CUSTODY_OPTIONAL = ['dps_cust','nominal_cust','holding_cust','loan_cust','wht_cust','net_sc_cust']
+
+JOIN_KEYS = ['event_key','isin','bank_account']
+DIFF_PAIRS = [
+    ('gross_nbim','gross_cust'),
+    ('net_nbim','net_cust'),
+    ('tax_rate_nbim','tax_rate_cust'),
+    ('fx_nbim','fx_cust'),
+]
+
 
 def load_nbim_csv(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, sep=';')
-    df = df.rename(columns={
-        'COAC_EVENT_KEY': 'event_key',
-        'ISIN': 'isin',
-        'ORGANISATION_NAME': 'organisation',
-        'BANK_ACCOUNT': 'bank_account',             # keep per-leg key
-        'GROSS_AMOUNT_QUOTATION': 'gross_nbim',
-        'NET_AMOUNT_QUOTATION': 'net_nbim',
-        'WTHTAX_RATE': 'tax_rate_nbim',
-        'AVG_FX_RATE_QUOTATION_TO_PORTFOLIO': 'fx_nbim',
-        'QUOTATION_CURRENCY': 'quotation_currency',
-        'SETTLEMENT_CURRENCY': 'settlement_currency'
-    })
-    # keep currency columns too so we can detect cross-currency cases later
-    df = df[['event_key','isin','organisation','bank_account',
-             'gross_nbim','net_nbim','tax_rate_nbim','fx_nbim',
-             'quotation_currency','settlement_currency']]
-    df[['gross_nbim','net_nbim','tax_rate_nbim','fx_nbim']] = (
-        df[['gross_nbim','net_nbim','tax_rate_nbim','fx_nbim']].apply(pd.to_numeric, errors='coerce')
-    )
+    # only parse the columns we keep; the feeds carry ~30 more per leg
+    df = pd.read_csv(path, sep=';', usecols=lambda c: c in NBIM_RENAME)
+    df = df.rename(columns=NBIM_RENAME)
+    optional = [c for c in NBIM_OPTIONAL if c in df.columns]
+    df = df[NBIM_COLUMNS + optional]
+    df[NBIM_NUMERIC + optional] = df[NBIM_NUMERIC + optional].apply(pd.to_numeric, errors='coerce')
     # normalize bank_account to string (avoid 823456789 vs "823456789" mismatches)
     df['bank_account'] = df['bank_account'].astype(str).str.strip()
     df['isin'] = df['isin'].astype(str).str.upper().str.strip()
@@ -35,30 +81,16 @@ def load_nbim_csv(path: str) -> pd.DataFrame:
     return df
 
 def load_custody_csv(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, sep=';')
-    df = df.rename(columns={
-        'COAC_EVENT_KEY': 'event_key',
-        'ISIN': 'isin',
-        # some feeds use BANK_ACCOUNTS (plural) — normalize to bank_account
-        'BANK_ACCOUNTS': 'bank_account',
-        'BANK_ACCOUNT': 'bank_account',
-        'GROSS_AMOUNT': 'gross_cust',
-        'NET_AMOUNT_QC': 'net_cust',
-        'TAX_RATE': 'tax_rate_cust',
-        'FX_RATE': 'fx_cust',
-        'CURRENCIES': 'quotation_currency',
-        'SETTLED_CURRENCY': 'settlement_currency'
-    })
+    df = pd.read_csv(path, sep=';', usecols=lambda c: c in CUSTODY_RENAME)
+    df = df.rename(columns=CUSTODY_RENAME)
     # keep per-leg key
-    required = ['event_key','isin','bank_account','gross_cust','net_cust','tax_rate_cust','fx_cust']
-    missing = [c for c in required if c not in df.columns]
+    missing = [c for c in CUSTODY_COLUMNS if c not in df.columns]
     if missing:
         raise ValueError(f"Custody CSV missing columns needed for per-leg match: {missing}")
 
-    df = df[required]
-    df[['gross_cust','net_cust','tax_rate_cust','fx_cust']] = (
-        df[['gross_cust','net_cust','tax_rate_cust','fx_cust']].apply(pd.to_numeric, errors='coerce')
-    )
+    optional = [c for c in CUSTODY_OPTIONAL if c in df.columns]
+    df = df[CUSTODY_COLUMNS + optional]
+    df[CUSTODY_NUMERIC + optional] = df[CUSTODY_NUMERIC + optional].apply(pd.to_numeric, errors='coerce')
     df['bank_account'] = df['bank_account'].astype(str).str.strip()
     df['isin'] = df['isin'].astype(str).str.upper().str.strip()
     df['event_key'] = df['event_key'].astype(str).str.strip()
@@ -69,30 +101,27 @@ def load_custody_csv(path: str) -> pd.DataFrame:
         df['settlement_currency'] = df['settlement_currency'].astype(str).str.upper().str.strip()
     return df
 
-def load_and_align(nbim_path: str, custody_path: str) -> pd.DataFrame:
-    nbim = load_nbim_csv(nbim_path)
-    custody = load_custody_csv(custody_path)
-
+def align_frames(nbim: pd.DataFrame, custody: pd.DataFrame) -> pd.DataFrame:
     # 1-to-1 per-leg match
     merged = nbim.merge(
         custody,
-        on=['event_key','isin','bank_account'],
+        on=JOIN_KEYS,
         how='inner',
         suffixes=('_nbim','_cust')
     )
 
     # quick diffs
-    for a, b in [
-        ('gross_nbim','gross_cust'),
-        ('net_nbim','net_cust'),
-        ('tax_rate_nbim','tax_rate_cust'),
-        ('fx_nbim','fx_cust'),
-    ]:
+    for a, b in DIFF_PAIRS:
         if a in merged.columns and b in merged.columns:
             merged[f'{a}_minus_{b}'] = merged[a] - merged[b]
 
     return merged
 
+def load_and_align(nbim_path: str, custody_path: str) -> pd.DataFrame:
+    nbim = load_nbim_csv(nbim_path)
+    custody = load_custody_csv(custody_path)
+    return align_frames(nbim, custody)
+
 if __name__ == "__main__":
     # Resolve data files relative to the project root 
     data_dir = Path(__file__).resolve().parent.parent / "data"
@@ -0,0 +1,106 @@
+"""Per-stage memory accounting for a recon run.
+
+Wrap each pipeline stage in `tracker.stage(name)`; the tracker records the
+resident set size after the stage, the process peak RSS so far and how much
+the stage raised that peak. The first stage to finish with the peak over
+the configured budget (RECON_MEMORY_BUDGET_MB, or the `budget_mb` argument)
+gets a warning naming it, and the run continues. Usually that stage pushed
+the peak past the budget; if the process was already over budget when it
+started, the warning says so. Later stages are not blamed again, and the
+report ends with an over-budget line.
+
+Peak RSS comes from getrusage where the `resource` module exists (Unix). On
+other hosts the tracker samples current RSS at stage boundaries instead, and
+reports zero where that is unavailable too.
+"""
+import os
+import sys
+import time
+import warnings
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+
+def _statm_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def current_rss_bytes() -> int:
+    """Resident set size now; falls back to the peak where /proc is absent."""
+    rss = _statm_rss_bytes()
+    if rss is None and resource is not None:
+        return peak_rss_bytes()
+    return rss or 0
+
+
+def peak_rss_bytes() -> int:
+    """Process peak RSS; current RSS where getrusage is unavailable."""
+    if resource is None:
+        return current_rss_bytes()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryTracker:
+    def __init__(self, budget_mb: Optional[float] = None):
+        if budget_mb is None:
+            env = os.getenv("RECON_MEMORY_BUDGET_MB")
+            budget_mb = float(env) if env else None
+        self.budget_mb = budget_mb
+        self.stages: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        peak_before = peak_rss_bytes()
+        start = time.perf_counter()
+        yield
+        peak_after = peak_rss_bytes()
+        record = {
+            "stage": name,
+            "seconds": round(time.perf_counter() - start, 3),
+            "rss_mb": round(current_rss_bytes() / MB, 1),
+            "peak_mb": round(peak_after / MB, 1),
+            "peak_growth_mb": round((peak_after - peak_before) / MB, 1),
+            "crossed_budget": self.budget_mb is not None
+            and peak_after > self.budget_mb * MB
+            and not any(s["crossed_budget"] for s in self.stages),
+        }
+        self.stages.append(record)
+        if record["crossed_budget"]:
+            if peak_before > self.budget_mb * MB:
+                cause = (f"Peak RSS was already {peak_before / MB:.1f} MB when stage "
+                         f"'{name}' started")
+            else:
+                cause = f"Stage '{name}' pushed peak RSS to {record['peak_mb']} MB"
+            warnings.warn(f"{cause}, over the {self.budget_mb:g} MB budget.", UserWarning)
+
+    @property
+    def over_budget(self) -> bool:
+        """Whether the peak went over budget during any tracked stage."""
+        return any(s["crossed_budget"] for s in self.stages)
+
+    def report(self) -> str:
+        budget = f"{self.budget_mb:g} MB" if self.budget_mb is not None else "none"
+        lines = [f"Memory by stage (budget: {budget})"]
+        for s in self.stages:
+            lines.append(
+                f"  {s['stage']:<14} {s['seconds']:>8.2f}s  rss {s['rss_mb']:>9.1f} MB  "
+                f"peak {s['peak_mb']:>9.1f} MB  (+{s['peak_growth_mb']:.1f})"
+                + ("  <- over budget" if s["crossed_budget"] else "")
+            )
+        if self.over_budget:
+            peak = max(s["peak_mb"] for s in self.stages)
+            lines.append(f"  OVER BUDGET: peak RSS {peak} MB > {self.budget_mb:g} MB")
+        return "\n".join(lines)
@@ -0,0 +1,159 @@
+"""Recompute what each leg's amounts should be from the booking inputs.
+
+Break detection in recon_breaks only compares the reported numbers. This
+module derives the expected figures from dividend rate, position, securities
+lending, withholding rate and settlement FX for every leg at once (numpy
+column arithmetic, no row loop), then checks each side against its own
+inputs and the two sides' inputs against each other. The result names which
+side and which input explains a difference - deterministically, no LLM.
+
+Added columns (all in place):
+    exp_position         NBIM nominal minus custody loan quantity
+    exp_gross            dividend rate x exp_position
+    exp_wht_nbim/_cust   exp_gross x each side's withholding rate
+    exp_net_nbim/_cust   exp_gross - withholding (- NBIM local tax)
+    exp_net_sc_nbim/_cust  expected net in settlement currency
+    recalc_side          nbim | custody | both | undetermined | none
+    recalc_label         "custody:position | undetermined:withholding_rate"
+"""
+import numpy as np
+import pandas as pd
+
+from recon_breaks import BREAK_RTOL, BREAK_ATOL
+
+# FX-converted amounts are rounded by each side with its own rate precision
+SETTLEMENT_RTOL = 1e-3
+
+# (side, input) per finding; bit i of the finding code is RECALC_FINDINGS[i]
+RECALC_FINDINGS = [
+    ("nbim", "gross_calc"),            # gross != NBIM dps x nominal
+    ("nbim", "net_calc"),              # net/tax != gross - gross x NBIM tax rate - local tax
+    ("custody", "gross_calc"),         # gross != custody dps x booked quantity
+    ("custody", "net_calc"),           # net/tax != gross x custody tax rate
+    ("nbim", "lending"),               # NBIM gross includes lent shares
+    ("custody", "lending"),            # custody gross includes lent shares
+    ("nbim", "position"),              # NBIM nominal != custody holding + loan
+    ("custody", "position"),           # custody holding + loan != its own nominal
+    ("undetermined", "dividend_rate"),     # sides disagree on dividend per share
+    ("undetermined", "withholding_rate"),  # sides disagree on withholding rate
+    ("nbim", "settlement_fx"),         # NBIM settlement amount != net / settlement FX
+    ("custody", "settlement_fx"),      # custody settlement amount != net / its FX
+]
+
+
+def _col(df: pd.DataFrame, name: str) -> np.ndarray:
+    """Column as float64, all-NaN when the feed did not carry it."""
+    if name in df.columns:
+        return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+    return np.full(len(df), np.nan)
+
+
+def _differs(a: np.ndarray, b: np.ndarray, rtol: float = BREAK_RTOL) -> np.ndarray:
+    """True where both values are known and not close (same test as break flags)."""
+    known = ~np.isnan(a) & ~np.isnan(b)
+    return known & ~np.isclose(a, b, rtol=rtol, atol=BREAK_ATOL)
+
+
+def _finding_labels():
+    """Lookup from finding bitmask to (side, label) for every combination."""
+    sides, labels = {}, {}
+    for code in range(1 << len(RECALC_FINDINGS)):
+        hits = [RECALC_FINDINGS[i] for i in range(len(RECALC_FINDINGS)) if code >> i & 1]
+        found = {side for side, _ in hits}
+        if not hits:
+            sides[code] = "none"
+        elif {"nbim", "custody"} <= found:
+            sides[code] = "both"
+        elif found & {"nbim", "custody"}:
+            sides[code] = (found & {"nbim", "custody"}).pop()
+        else:
+            sides[code] = "undetermined"
+        labels[code] = " | ".join(f"{side}:{name}" for side, name in hits) if hits else "ok"
+    return sides, labels
+
+
+_FINDING_SIDES, _FINDING_LABELS = _finding_labels()
+
+
+def recompute_expected(df: pd.DataFrame) -> pd.DataFrame:
+    """Add expected amounts and side/input attribution to `df` in place."""
+    dps_nbim = _col(df, "dps_nbim")
+    dps_cust = _col(df, "dps_cust")
+    nominal_nbim = _col(df, "nominal_nbim")
+    nominal_cust = _col(df, "nominal_cust")
+    holding_cust = _col(df, "holding_cust")
+    loan = np.nan_to_num(_col(df, "loan_cust"))
+    tax_rate_nbim, tax_rate_cust = _col(df, "tax_rate_nbim"), _col(df, "tax_rate_cust")
+    rate_nbim, rate_cust = tax_rate_nbim / 100.0, tax_rate_cust / 100.0
+    # blank local tax means none; a feed without the column leaves it unknown
+    localtax_nbim = _col(df, "localtax_nbim")
+    if "localtax_nbim" in df.columns:
+        localtax_nbim = np.nan_to_num(localtax_nbim)
+    gross_nbim, gross_cust = _col(df, "gross_nbim"), _col(df, "gross_cust")
+    net_nbim, net_cust = _col(df, "net_nbim"), _col(df, "net_cust")
+    wht_nbim, wht_cust = _col(df, "wht_nbim"), _col(df, "wht_cust")
+    net_sc_nbim, net_sc_cust = _col(df, "net_sc_nbim"), _col(df, "net_sc_cust")
+    fx_cust = _col(df, "fx_cust")
+
+    # Custody FX_RATE is quotation units per settlement unit; 1 when they match
+    if "quotation_currency" in df.columns and "settlement_currency" in df.columns:
+        cross = (df["quotation_currency"] != df["settlement_currency"]).to_numpy()
+    else:
+        cross = np.zeros(len(df), dtype=bool)
+    settle_fx = np.where(cross, fx_cust, 1.0)
+
+    # Expected figures: NBIM dividend rate on the lending-adjusted position
+    exp_position = nominal_nbim - loan
+    exp_gross = dps_nbim * exp_position
+    exp_wht_nbim = exp_gross * rate_nbim
+    exp_wht_cust = exp_gross * rate_cust
+    exp_net_nbim = exp_gross - exp_wht_nbim - localtax_nbim
+    exp_net_cust = exp_gross - exp_wht_cust
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exp_net_sc_nbim = exp_net_nbim / settle_fx
+        exp_net_sc_cust = exp_net_cust / settle_fx
+
+    # Which quantity did each side pay on? Lent shares booked as held = lending.
+    lent = loan > 0
+    nbim_on_nominal = ~_differs(gross_nbim, dps_nbim * nominal_nbim)
+    cust_on_nominal = ~_differs(gross_cust, dps_cust * (holding_cust + loan))
+    nbim_lending = lent & nbim_on_nominal & _differs(gross_nbim, exp_gross)
+    cust_lending = lent & cust_on_nominal & _differs(gross_cust, dps_cust * holding_cust)
+    nbim_qty = np.where(nbim_lending, nominal_nbim, exp_position)
+    cust_qty = np.where(cust_lending, holding_cust + loan, holding_cust)
+
+    # Each side against its own inputs, one step at a time from what it reported
+    with np.errstate(divide="ignore", invalid="ignore"):
+        findings = [
+            _differs(gross_nbim, dps_nbim * nbim_qty),
+            _differs(net_nbim, gross_nbim - gross_nbim * rate_nbim - localtax_nbim)
+            | _differs(wht_nbim, gross_nbim * rate_nbim),
+            _differs(gross_cust, dps_cust * cust_qty),
+            _differs(net_cust, gross_cust - gross_cust * rate_cust)
+            | _differs(wht_cust, gross_cust * rate_cust),
+            nbim_lending,
+            cust_lending,
+            _differs(nominal_nbim, holding_cust + loan) & ~_differs(holding_cust + loan, nominal_cust),
+            _differs(holding_cust + loan, nominal_cust),
+            _differs(dps_nbim, dps_cust),
+            _differs(tax_rate_nbim, tax_rate_cust),
+            _differs(net_sc_nbim, net_nbim / settle_fx, rtol=SETTLEMENT_RTOL),
+            _differs(net_sc_cust, net_cust / settle_fx, rtol=SETTLEMENT_RTOL),
+        ]
+
+    code = np.zeros(len(df), dtype=np.int64)
+    for bit, hit in enumerate(findings):
+        code |= hit.astype(np.int64) << bit
+
+    df["exp_position"] = exp_position
+    df["exp_gross"] = exp_gross
+    df["exp_wht_nbim"] = exp_wht_nbim
+    df["exp_wht_cust"] = exp_wht_cust
+    df["exp_net_nbim"] = exp_net_nbim
+    df["exp_net_cust"] = exp_net_cust
+    df["exp_net_sc_nbim"] = exp_net_sc_nbim
+    df["exp_net_sc_cust"] = exp_net_sc_cust
+    codes = pd.Series(code, index=df.index)
+    df["recalc_side"] = codes.map(_FINDING_SIDES)
+    df["recalc_label"] = codes.map(_FINDING_LABELS)
+    return df
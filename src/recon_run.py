@@ -1,50 +1,15 @@
 import pandas as pd
 from pathlib import Path
-from recon_loader import load_and_align  
-from recon_breaks import classify_breaks
+from recon_engine import get_engine
+from recon_memory import MemoryTracker
+from recon_recompute import recompute_expected
+from llm_prompts import RUN_BUDGET
 from fx_market_agent import verify_fx_with_intelligence
 from insights_agent import generate_business_summary
 from pathlib import Path
 from email_agent import generate_recon_email_concise, save_email_draft
 import os
 
-def compute_deterministic_analysis(merged_df):
-    """Everything computable without LLM"""
-    breaks = classify_breaks(merged_df)
-    
-    # Enhanced cash impact calculation
-    breaks['cash_impact'] = breaks.apply(
-        lambda r: max(abs(float(r.get('gross_nbim', 0) or 0) - float(r.get('gross_cust', 0) or 0)), 
-                     abs(float(r.get('net_nbim', 0) or 0) - float(r.get('net_cust', 0) or 0))), 
-        axis=1
-    )
-    
-    # Enhanced priority - categorize ALL breaks, not just filtering
-    def calculate_priority(row):
-        cash_impact = row['cash_impact']
-        break_type = row.get('break_label', '')
-        
-        # FX and tax breaks are higher priority due to systemic risk
-        if 'fx' in break_type.lower() or 'tax' in break_type.lower():
-            if cash_impact > 50000:
-                return 'CRITICAL'
-            elif cash_impact > 5000:
-                return 'HIGH'
-        
-        # Standard cash impact based priority
-        if cash_impact > 100000:
-            return 'CRITICAL'
-        elif cash_impact > 10000:
-            return 'HIGH' 
-        elif cash_impact > 1000:
-            return 'MEDIUM'
-        else:
-            return 'LOW'
-    
-    breaks['priority'] = breaks.apply(calculate_priority, axis=1)
-    
-    return breaks
-
 if __name__ == "__main__":
     # Fix paths based on project structure
     project_root = Path(__file__).resolve().parent.parent  # Goes from src/ to NBIM/
@@ -71,30 +36,38 @@ if __name__ == "__main__":
     print("Data files found")
     
     # 1. Load and compute everything deterministically
-    merged = load_and_align(
+    # 2. All deterministic analysis first (engine picked via RECON_ENGINE)
+    engine = get_engine()
+    print(f"Recon engine: {engine.name}")
+    tracker = MemoryTracker()
+    breaks = engine.analyze(
         str(nbim_file),
-        str(custody_file)
+        str(custody_file),
+        tracker=tracker
     )
-    
-    # 2. All deterministic analysis first
-    breaks = compute_deterministic_analysis(merged)
-    broken = breaks[breaks["break_label"] != "ok"].copy()
+    # Expected amounts + which side/input explains each difference (no LLM)
+    with tracker.stage("recompute"):
+        recompute_expected(breaks)
+    # The only copy after the join: keep the broken legs, free the full book
+    with tracker.stage("filter"):
+        broken = breaks[breaks["break_label"] != "ok"]
+        del breaks
     
     if not broken.empty:
         print(f"Found {len(broken)} total breaks")
         
         # NO FILTERING - process ALL breaks, but prioritize them
-        material_breaks = broken.copy()  # Now includes all breaks
-        
-        print(f"Processing ALL {len(material_breaks)} breaks by priority...")
+        print(f"Processing ALL {len(broken)} breaks by priority...")
         
         # 3. LLM CALL #1: Smart FX analysis only for FX breaks
         print("Applying FX intelligence to breaks...")
-        broken_with_fx = verify_fx_with_intelligence(material_breaks)
+        with tracker.stage("fx_verify"):
+            broken_with_fx = verify_fx_with_intelligence(broken)
         
         # 4. LLM CALL #2: Business synthesis of ALL breaks
         print("Generating comprehensive business summary...")
-        final_summary = generate_business_summary(broken_with_fx)
+        with tracker.stage("summary"):
+            final_summary = generate_business_summary(broken_with_fx)
         
         # Save results
         broken_with_fx.to_csv(out_dir / "recon_breaks_detailed.csv", index=False)
@@ -108,10 +81,14 @@ if __name__ == "__main__":
         print("Composing and formatting reconciliation email (LLM call #3)...")
 
         # 5. LLM CALL #3: Email composition
-        email_md = generate_recon_email_concise(broken_with_fx, final_summary, audience="FX Reconciliation Team", sender_name="Noah")
+        with tracker.stage("email"):
+            email_md = generate_recon_email_concise(broken_with_fx, final_summary, audience="FX Reconciliation Team", sender_name="Noah")
         email_path = out_dir / "recon_email_draft.md"
         save_email_draft(email_md, str(email_path))
 
         print("Reconciliation email draft generated")
+        print(RUN_BUDGET.report(n_breaks=len(broken)))
     else:
-        print("No breaks found - all reconciliations clean!")
\ No newline at end of file
+        print("No breaks found - all reconciliations clean!")
+
+    print(tracker.report())
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""Both recon engines must produce identical break outputs."""
+import csv
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_engines import break_outputs
+from recon_engine import get_engine
+
+pytest.importorskip("polars")
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+NBIM_CSV = DATA_DIR / "NBIM_Dividend_Bookings 1 (2).csv"
+CUSTODY_CSV = DATA_DIR / "CUSTODY_Dividend_Bookings 1 (2).csv"
+
+
+def _rewrite(src: Path, dst: Path, edits: dict):
+    """Copy a sample feed, overwriting {(row_index, column): value}."""
+    with open(src, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f, delimiter=";"))
+    for (i, column), value in edits.items():
+        rows[i][column] = value
+    with open(dst, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]), delimiter=";")
+        writer.writeheader()
+        writer.writerows(rows)
+    return dst
+
+
+FIXTURES = {
+    "sample": ({}, {}),
+    "null_gross": ({(2, "GROSS_AMOUNT_QUOTATION"): ""}, {}),
+    "null_net_both_sides": ({(1, "NET_AMOUNT_QUOTATION"): ""}, {(1, "NET_AMOUNT_QC"): ""}),
+    "null_tax_rate": ({}, {(1, "TAX_RATE"): ""}),
+    "tiny_fx": ({(0, "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO"): "0.00001234"}, {}),
+    "huge_fx": ({}, {(1, "FX_RATE"): "123456789012345678"}),
+}
+
+
+@pytest.fixture(params=sorted(FIXTURES))
+def feeds(request, tmp_path):
+    nbim_edits, custody_edits = FIXTURES[request.param]
+    return (
+        _rewrite(NBIM_CSV, tmp_path / "nbim.csv", nbim_edits),
+        _rewrite(CUSTODY_CSV, tmp_path / "custody.csv", custody_edits),
+    )
+
+
+def _run(engine: str, nbim: Path, custody: Path) -> pd.DataFrame:
+    return break_outputs(get_engine(engine).analyze(str(nbim), str(custody)))
+
+
+def test_engines_produce_identical_break_outputs(feeds):
+    reference = _run("pandas", *feeds)
+    result = _run("polars", *feeds)
+    pd.testing.assert_frame_equal(reference, result, check_dtype=False)
+
+
+def test_labels_keep_the_reference_number_format(tmp_path):
+    nbim = _rewrite(NBIM_CSV, tmp_path / "nbim.csv", {})
+    custody = _rewrite(CUSTODY_CSV, tmp_path / "custody.csv", {})
+    for engine in ("pandas", "polars"):
+        labels = _run(engine, nbim, custody).set_index("event_key")["break_label"]
+        assert labels["960789012"].startswith("tax_rate_diff:22vs20 | fx_diff:0.008234vs1307.25")
+
+
+def test_integer_column_with_missing_value_formats_as_float(tmp_path):
+    nbim = _rewrite(NBIM_CSV, tmp_path / "nbim.csv", {})
+    custody = _rewrite(CUSTODY_CSV, tmp_path / "custody.csv", {(0, "TAX_RATE"): ""})
+    for engine in ("pandas", "polars"):
+        labels = _run(engine, nbim, custody).set_index("event_key")["break_label"]
+        assert labels["960789012"].startswith("tax_rate_diff:22vs20.0")
+        assert labels["950123456"].startswith("tax_rate_diff:15vsnan")
+
+
+def test_missing_gross_is_ignored_in_cash_impact(tmp_path):
+    nbim = _rewrite(NBIM_CSV, tmp_path / "nbim.csv", {(2, "GROSS_AMOUNT_QUOTATION"): ""})
+    custody = _rewrite(CUSTODY_CSV, tmp_path / "custody.csv", {})
+    for engine in ("pandas", "polars"):
+        out = _run(engine, nbim, custody).set_index("bank_account")
+        assert out.loc["823456789", "cash_impact"] == 0.0
+        assert out.loc["823456789", "priority"] == "LOW"
+
+
+def test_cash_impact_unknown_when_both_diffs_missing(tmp_path):
+    nbim = _rewrite(NBIM_CSV, tmp_path / "nbim.csv",
+                    {(2, "GROSS_AMOUNT_QUOTATION"): "", (2, "NET_AMOUNT_QUOTATION"): ""})
+    custody = _rewrite(CUSTODY_CSV, tmp_path / "custody.csv", {})
+    for engine in ("pandas", "polars"):
+        out = _run(engine, nbim, custody).set_index("bank_account")
+        assert np.isnan(out.loc["823456789", "cash_impact"])
+        assert out.loc["823456789", "priority"] == "LOW"
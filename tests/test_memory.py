@@ -0,0 +1,51 @@
+"""MemoryTracker flags the first stage that ends over the budget, once."""
+import warnings
+
+import numpy as np
+
+import recon_memory
+from recon_memory import MB, MemoryTracker, peak_rss_bytes
+
+
+def _run_stages(tracker, big_stage=None):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        for name in ("small", "big", "after"):
+            with tracker.stage(name):
+                if name == big_stage:
+                    block = np.ones(int(160 * MB // 8))
+                    del block
+    return [str(w.message) for w in caught]
+
+
+def test_only_crossing_stage_warns():
+    tracker = MemoryTracker(budget_mb=peak_rss_bytes() / MB + 64)
+    messages = _run_stages(tracker, big_stage="big")
+    assert len(messages) == 1 and messages[0].startswith("Stage 'big' pushed")
+    assert [s["crossed_budget"] for s in tracker.stages] == [False, True, False]
+    assert tracker.over_budget
+    assert "OVER BUDGET" in tracker.report()
+
+
+def test_budget_already_exceeded_before_first_stage():
+    tracker = MemoryTracker(budget_mb=1)
+    messages = _run_stages(tracker)
+    assert len(messages) == 1 and "already" in messages[0] and "'small'" in messages[0]
+    assert [s["crossed_budget"] for s in tracker.stages] == [True, False, False]
+    assert tracker.over_budget
+    assert "OVER BUDGET" in tracker.report()
+
+
+def test_within_budget_is_quiet():
+    tracker = MemoryTracker(budget_mb=peak_rss_bytes() / MB + 1024)
+    assert _run_stages(tracker) == []
+    assert not tracker.over_budget
+    assert "OVER BUDGET" not in tracker.report()
+
+
+def test_tracks_without_resource_module(monkeypatch):
+    monkeypatch.setattr(recon_memory, "resource", None)
+    assert peak_rss_bytes() == recon_memory.current_rss_bytes() > 0
+    tracker = MemoryTracker()
+    _run_stages(tracker)
+    assert len(tracker.stages) == 3
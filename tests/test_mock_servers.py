@@ -0,0 +1,151 @@
+"""Mock LLM / Norges Bank servers: per-server counters and config checks."""
+import json
+import random
+import socket
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from mock_servers import MockConfig, MockState, start_mock_servers
+
+
+def _get(port: int, path: str) -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}") as r:
+        return json.loads(r.read())
+
+
+def _chat(port: int, content: str) -> dict:
+    body = json.dumps({"model": "m", "messages": [{"role": "user", "content": content}]}).encode()
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/v1/chat/completions", data=body,
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as r:
+        return json.loads(r.read())
+
+
+@pytest.fixture
+def servers():
+    llm, fx = start_mock_servers(MockConfig(), llm_port=0, fx_port=0)
+    yield llm.server_address[1], fx.server_address[1]
+    llm.shutdown()
+    fx.shutdown()
+
+
+def test_stats_are_kept_per_server(servers):
+    llm_port, fx_port = servers
+    _chat(llm_port, "hello")
+    _chat(llm_port, "hello again")
+    _get(fx_port, "/api/data/EXR/B.USD.NOK.SP?startPeriod=2025-04-25")
+
+    llm_stats, fx_stats = _get(llm_port, "/stats"), _get(fx_port, "/stats")
+    assert llm_stats["requests"] == 2 and llm_stats["prompt_tokens"] > 0
+    assert fx_stats["requests"] == 1 and fx_stats["prompt_tokens"] == 0
+
+
+def test_fx_endpoint_returns_sdmx_json(servers):
+    _, fx_port = servers
+    data = _get(fx_port, "/api/data/EXR/B.USD.NOK.SP?startPeriod=2025-04-25")
+    series = data["data"]["dataSets"][0]["series"]
+    assert float(next(iter(series.values()))["observations"]["0"][0]) == 10.4266
+
+
+def test_custom_responses_without_catch_all_fall_back():
+    llm, fx = start_mock_servers(MockConfig(llm_responses={"marker": "hit"}), llm_port=0, fx_port=0)
+    try:
+        port = llm.server_address[1]
+        assert _chat(port, "has marker")["choices"][0]["message"]["content"] == "hit"
+        assert _chat(port, "no match")["choices"][0]["message"]["content"]
+    finally:
+        llm.shutdown()
+        fx.shutdown()
+
+
+@pytest.mark.parametrize("spec", ["bogus:1", "uniform:1", "normal:a,b", "fixed:1,2"])
+def test_invalid_latency_fails_at_config_time(spec):
+    with pytest.raises(ValueError):
+        MockConfig(latency=spec)
+
+
+def _serving(config: MockConfig):
+    llm, fx = start_mock_servers(config, llm_port=0, fx_port=0)
+    return llm, fx, llm.server_address[1]
+
+
+def test_error_injection_answers_with_configured_status():
+    llm, fx, port = _serving(MockConfig(error_rate=1.0, error_status=429))
+    try:
+        with pytest.raises(urllib.error.HTTPError) as err:
+            _chat(port, "hello")
+        assert err.value.code == 429
+        assert _get(port, "/stats")["errors"] == 1
+    finally:
+        llm.shutdown()
+        fx.shutdown()
+
+
+def test_timeout_injection_hangs_past_the_client_timeout():
+    llm, fx, _ = _serving(MockConfig(timeout_rate=1.0, timeout_seconds=1.0))
+    try:
+        url = f"http://127.0.0.1:{fx.server_address[1]}/api/data/EXR/B.USD.NOK.SP"
+        with pytest.raises((socket.timeout, urllib.error.URLError)):
+            urllib.request.urlopen(url, timeout=0.2)
+        assert _get(fx.server_address[1], "/stats")["timeouts"] == 1
+    finally:
+        llm.shutdown()
+        fx.shutdown()
+
+
+@pytest.mark.parametrize("spec, low, high", [
+    ("fixed:0.25", 0.25, 0.25),
+    ("uniform:0.1,0.2", 0.1, 0.2),
+    ("normal:0.05,1.0", 0.0, float("inf")),
+    ("lognormal:-3,0.5", 0.0, float("inf")),
+])
+def test_latency_samples_follow_the_distribution(spec, low, high):
+    state = MockState(MockConfig(latency=spec))
+    samples = [state.sample_latency() for _ in range(200)]
+    assert all(low <= s <= high for s in samples)
+    replay = MockState(MockConfig(latency=spec))
+    assert samples == [replay.sample_latency() for _ in range(200)]   # seeded
+
+
+def test_latency_is_applied_to_requests():
+    llm, fx, port = _serving(MockConfig(latency="fixed:0.3"))
+    try:
+        start = time.perf_counter()
+        _chat(port, "hello")
+        assert time.perf_counter() - start >= 0.3
+    finally:
+        llm.shutdown()
+        fx.shutdown()
+
+
+def test_openai_client_retries_on_429():
+    openai = pytest.importorskip("openai")
+    llm, fx, port = _serving(MockConfig(error_rate=1.0, error_status=429))
+    try:
+        client = openai.OpenAI(base_url=f"http://127.0.0.1:{port}/v1", api_key="mock", max_retries=2)
+        with pytest.raises(openai.RateLimitError):
+            client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hi"}])
+        assert _get(port, "/stats")["requests"] == 3
+    finally:
+        llm.shutdown()
+        fx.shutdown()
+
+
+def test_openai_client_recovers_after_injected_429():
+    openai = pytest.importorskip("openai")
+    # a seed whose first roll fails (< 0.5) and second succeeds
+    seed = next(s for s in range(1000)
+                if (lambda r: r.random() < 0.5 <= r.random())(random.Random(s)))
+    llm, fx, port = _serving(MockConfig(error_rate=0.5, error_status=429, seed=seed))
+    try:
+        client = openai.OpenAI(base_url=f"http://127.0.0.1:{port}/v1", api_key="mock", max_retries=2)
+        resp = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hi"}])
+        assert resp.choices[0].message.content
+        stats = _get(port, "/stats")
+        assert (stats["requests"], stats["errors"]) == (2, 1)
+    finally:
+        llm.shutdown()
+        fx.shutdown()
@@ -0,0 +1,54 @@
+"""Prompt budgeting: summary truncation leaves room for the top facts."""
+import pandas as pd
+
+import email_agent
+from llm_prompts import RUN_BUDGET, compact_json, estimate_tokens, fit_items, rank_items, truncate_text
+
+
+def test_truncate_text_cuts_at_line_break():
+    text = "\n".join(f"line {i} " + "x" * 30 for i in range(100))
+    cut = truncate_text(text, 50)
+    assert estimate_tokens(cut) <= 50
+    assert cut.endswith("[... truncated]")
+    assert all(line.startswith("line ") for line in cut.splitlines()[:-1])
+    assert truncate_text("short", 50) == "short"
+
+
+def test_long_summary_does_not_crowd_out_facts(monkeypatch):
+    sent = {}
+
+    def fake_call_llm(prompt_text, system=None, label="llm"):
+        sent["tokens"] = estimate_tokens(prompt_text) + estimate_tokens(system)
+        sent["prompt"] = prompt_text
+        return ""
+
+    monkeypatch.setattr(email_agent, "call_llm", fake_call_llm)
+    monkeypatch.setattr(RUN_BUDGET, "per_call", 800)
+    df = pd.DataFrame({
+        "event_key": [f"E{i}" for i in range(20)],
+        "priority": ["CRITICAL"] + ["LOW"] * 19,
+        "cash_impact": [1e6] + [10.0] * 19,
+        "break_label": ["fx_nbim:1.0vs2.0"] * 20,
+    })
+    email_agent.generate_recon_email_concise(df, "## Summary\n" + "word " * 5000)
+
+    assert sent["tokens"] <= 800
+    assert "[... truncated]" in sent["prompt"]
+    assert '"event":"E0"' in sent["prompt"]
+
+
+def test_rank_items_treats_unknown_cash_impact_as_zero():
+    items = [{"id": "a", "cash_impact": 5.0}, {"id": "b", "cash_impact": float("nan")},
+             {"id": "c", "cash_impact": 50.0}, {"id": "d"}, {"id": "e", "cash_impact": None}]
+    assert [i["id"] for i in rank_items(items)][:3] == ["c", "a", "b"]
+
+    items = [dict(i, priority="HIGH") for i in items] + [{"id": "f", "priority": "LOW", "cash_impact": 1e6}]
+    assert [i["id"] for i in rank_items(items)][:2] == ["c", "a"]
+    assert rank_items(items)[-1]["id"] == "f"
+
+
+def test_fit_items_drops_unknown_impact_before_known():
+    items = [{"id": n, "priority": "HIGH", "cash_impact": c}
+             for n, c in (("x", 5.0), ("y", float("nan")), ("z", 50.0))]
+    facts, dropped = fit_items(items, estimate_tokens(compact_json(rank_items(items)[:2])))
+    assert dropped == 1 and '"z"' in facts and '"x"' in facts
@@ -0,0 +1,96 @@
+"""Expected-amount recomputation and side/input attribution on the sample feeds."""
+import csv
+from pathlib import Path
+
+import pytest
+
+from recon_engine import get_engine
+from recon_loader import CUSTODY_OPTIONAL, CUSTODY_RENAME, NBIM_OPTIONAL, NBIM_RENAME
+from recon_recompute import recompute_expected
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+NBIM_CSV = DATA_DIR / "NBIM_Dividend_Bookings 1 (2).csv"
+CUSTODY_CSV = DATA_DIR / "CUSTODY_Dividend_Bookings 1 (2).csv"
+
+
+def _feed(src: Path, dst: Path, edits: dict = None, drop=()):
+    """Copy a sample feed, setting {bank_account: {column: value}} and dropping columns."""
+    with open(src, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f, delimiter=";"))
+    account = "BANK_ACCOUNT" if "BANK_ACCOUNT" in rows[0] else "BANK_ACCOUNTS"
+    for row in rows:
+        row.update((edits or {}).get(row[account], {}))
+    fields = [c for c in rows[0] if c not in drop]
+    with open(dst, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, delimiter=";", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    return dst
+
+
+def _recompute(tmp_path, nbim_edits=None, custody_edits=None, drop_optional=False):
+    nbim_drop = [k for k, v in NBIM_RENAME.items() if v in NBIM_OPTIONAL] if drop_optional else ()
+    cust_drop = [k for k, v in CUSTODY_RENAME.items() if v in CUSTODY_OPTIONAL] if drop_optional else ()
+    nbim = _feed(NBIM_CSV, tmp_path / "nbim.csv", nbim_edits, nbim_drop)
+    custody = _feed(CUSTODY_CSV, tmp_path / "custody.csv", custody_edits, cust_drop)
+    df = get_engine("pandas").analyze(str(nbim), str(custody))
+    return recompute_expected(df).set_index("bank_account")
+
+
+def test_sample_attribution(tmp_path):
+    out = _recompute(tmp_path)
+    assert out.loc["712345678", "recalc_label"] == (
+        "nbim:lending | custody:lending | undetermined:withholding_rate"
+    )
+    assert out.loc["712345678", "recalc_side"] == "both"
+    for account in ("823456790", "823456791"):
+        assert out.loc[account, "recalc_label"] == "custody:position"
+        assert out.loc[account, "recalc_side"] == "custody"
+    for account in ("501234567", "823456789"):
+        assert (out.loc[account, "recalc_side"], out.loc[account, "recalc_label"]) == ("none", "ok")
+
+
+def test_expected_amounts_use_lending_adjusted_position(tmp_path):
+    out = _recompute(tmp_path).loc["712345678"]
+    assert out["exp_position"] == out["nominal_nbim"] - out["loan_cust"]
+    assert out["exp_gross"] == pytest.approx(out["dps_nbim"] * out["exp_position"])
+    assert out["exp_net_nbim"] == pytest.approx(
+        out["exp_gross"] * (1 - out["tax_rate_nbim"] / 100) - out["localtax_nbim"]
+    )
+
+
+@pytest.mark.parametrize("side, edits, label", [
+    ("nbim", {"WTHTAX_COST_QUOTATION": "99999"}, "nbim:net_calc"),
+    ("custody", {"TAX": "99999"}, "custody:net_calc"),
+])
+def test_reported_withholding_is_checked_on_both_sides(tmp_path, side, edits, label):
+    changed = {"501234567": edits}
+    out = _recompute(tmp_path, **{f"{side}_edits": changed})
+    assert out.loc["501234567", "recalc_label"] == label
+    assert out.loc["501234567", "recalc_side"] == side
+
+
+def test_cross_currency_settlement_mismatch(tmp_path):
+    # Samsung pays KRW and settles USD at the custody FX rate
+    out = _recompute(tmp_path, custody_edits={"712345678": {"NET_AMOUNT_SC": "6000"}})
+    assert out.loc["712345678", "recalc_label"].endswith("custody:settlement_fx")
+    out = _recompute(tmp_path, nbim_edits={"712345678": {"NET_AMOUNT_SETTLEMENT": "6000"}})
+    assert "nbim:settlement_fx" in out.loc["712345678", "recalc_label"]
+
+
+def test_same_currency_leg_ignores_fx_rate(tmp_path):
+    out = _recompute(tmp_path, custody_edits={"501234567": {"FX_RATE": "10"}})
+    assert out.loc["501234567", "recalc_label"] == "ok"
+
+
+def test_feed_without_optional_columns_finds_nothing(tmp_path):
+    # Tax rates are mandatory columns, so Samsung's 22% vs 20% still shows
+    out = _recompute(tmp_path, drop_optional=True)
+    assert out.loc["712345678", "recalc_label"] == "undetermined:withholding_rate"
+    assert set(out.drop("712345678")["recalc_label"]) == {"ok"}
+
+    # NBIM's net also carries local tax, which this feed no longer reports
+    out = _recompute(tmp_path, nbim_edits={"712345678": {"WTHTAX_RATE": "20"}}, drop_optional=True)
+    assert set(out["recalc_side"]) == {"none"}
+    assert set(out["recalc_label"]) == {"ok"}
+    assert out["exp_gross"].isna().all()